@@ -0,0 +1,49 @@
+"""
+Gunicorn configuration for serving the bot with several worker processes.
+
+    gunicorn --config gunicorn.conf.py
+
+Each worker runs its own event loop and calls ``chatx.app:create_app``. Per-user
+state (spaces, conversations, subscriptions) must live in storage shared by the
+workers (``BOT_STORAGE=sqlite`` or ``sqlite:///<path>`` on a local disk), otherwise
+it is only known to the worker that served the user's last message and is lost
+when that worker is recycled. With the default in-memory storage, a single worker
+is started and never recycled.
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = "chatx.app:create_app"
+pythonpath = "src"
+worker_class = "aiohttp.GunicornWebWorker"
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+shared_storage = os.getenv("BOT_STORAGE", "memory") != "memory"
+
+workers = int(
+    os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() if shared_storage else 1)
+)
+# SO_REUSEPORT lets the kernel balance new connections across workers
+reuse_port = True
+
+# Genie questions can take minutes; the arbiter must not kill a worker waiting on one
+timeout = 1200
+# Recycle workers periodically; the jitter keeps them from restarting together
+max_requests = int(os.getenv("MAX_REQUESTS", "1000" if shared_storage else "0"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "100"))
+# Time a recycled or stopped worker gets to drain in-flight turns
+# (see DRAIN_TIMEOUT_SECONDS, which should be slightly lower)
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "130"))
+
+
+def on_starting(server):
+    if shared_storage:
+        return
+    if server.cfg.workers > 1 or server.cfg.max_requests > 0:
+        raise RuntimeError(
+            "In-memory bot state is neither shared by several workers nor kept when a "
+            f"worker is recycled (workers={server.cfg.workers}, "
+            f"max_requests={server.cfg.max_requests}): set BOT_STORAGE to shared "
+            "storage, e.g. sqlite"
+        )
@@ -4,11 +4,15 @@ import sqlparse
 from botbuilder.core import CardFactory
 from botbuilder.schema import Attachment, ActivityTypes, Activity
 
+from chatx.chart import ChartSpec
 from chatx.const import WAITING_MESSAGE
+from chatx.export import PARQUET_AVAILABLE
 
 # Log
 logger = logging.getLogger(__name__)
 
+CHART_TYPES = {"line": "Chart.Line", "bar": "Chart.VerticalBar.Grouped"}
+
 
 class AdaptiveCardFactory:
     @staticmethod
@@ -16,7 +20,7 @@ class AdaptiveCardFactory:
         return Activity(type=ActivityTypes.message, attachments=attachments)
 
     @staticmethod
-    def get_waiting_message() -> Activity:
+    def get_waiting_message(message: str = WAITING_MESSAGE) -> Activity:
         attachment = CardFactory.adaptive_card(
             {
                 "type": "AdaptiveCard",
@@ -32,7 +36,7 @@ class AdaptiveCardFactory:
                     {"type": "ProgressBar"},
                     {
                         "type": "TextBlock",
-                        "text": WAITING_MESSAGE,
+                        "text": message,
                         "spacing": "ExtraSmall",
                         "size": "Small",
                     },
@@ -63,10 +67,18 @@ class AdaptiveCardFactory:
         col_output: list[dict[str, int]],
         row_output: list[dict[str, any]],
         query: str,
+        statement_id: str | None = None,
+        refresh_data: dict | None = None,
+        title: str = "Results",
     ) -> Activity:
         """
         Returns an adaptive card template for displaying query results.
+        If a statement ID is given, the card offers to export the full result; if
+        refresh data is given, it offers to re-run the query.
         """
+        actions = AdaptiveCardFactory.get_result_actions(
+            query, statement_id, refresh_data
+        )
         attachment = CardFactory.adaptive_card(
             {
                 "type": "AdaptiveCard",
@@ -74,7 +86,7 @@ class AdaptiveCardFactory:
                 "body": [
                     {
                         "type": "TextBlock",
-                        "text": "Results",
+                        "text": title,
                         "wrap": True,
                         "size": "Large",
                         "weight": "Bolder",
@@ -97,25 +109,170 @@ class AdaptiveCardFactory:
                         "rows": row_output,
                     },
                 ],
-                "actions": [
+                "actions": actions,
+            }
+        )
+
+        return AdaptiveCardFactory.get_activity([attachment])
+
+    @staticmethod
+    def get_result_actions(
+        query: str, statement_id: str | None = None, refresh_data: dict | None = None
+    ) -> list[dict]:
+        """
+        Returns the actions shared by result cards: showing the SQL query, exporting
+        the full result if a statement ID is given (to Parquet only if pyarrow is
+        installed), and refreshing it if refresh data is given.
+        """
+        actions = [
+            {
+                "type": "Action.ShowCard",
+                "title": "Show/hide SQL query",
+                "card": {
+                    "type": "AdaptiveCard",
+                    "body": [
+                        {
+                            "type": "CodeBlock",
+                            "codeSnippet": sqlparse.format(
+                                query, reindent=True, keyword_case="upper"
+                            ),
+                            "language": "Sql",
+                        }
+                    ],
+                },
+            }
+        ]
+        if statement_id:
+            actions.append(
+                AdaptiveCardFactory.get_export_action(statement_id, "csv", "Export CSV")
+            )
+            if PARQUET_AVAILABLE:
+                actions.append(
+                    AdaptiveCardFactory.get_export_action(
+                        statement_id, "parquet", "Export Parquet"
+                    )
+                )
+        if refresh_data:
+            actions.append(
+                {"type": "Action.Submit", "title": "Refresh", "data": refresh_data}
+            )
+        return actions
+
+    @staticmethod
+    def get_chart_card(
+        response: str,
+        chart: ChartSpec,
+        query: str,
+        statement_id: str | None = None,
+        refresh_data: dict | None = None,
+        title: str = "Results",
+    ) -> Activity:
+        """
+        Returns an adaptive card with a line or bar chart of a downsampled result.
+        """
+        element = {
+            "type": CHART_TYPES[chart.kind],
+            "xAxisTitle": chart.x_title,
+            "data": [
+                {
+                    "legend": series.name,
+                    "values": [{"x": x, "y": y} for x, y in series.points],
+                }
+                for series in chart.series
+            ],
+        }
+        attachment = CardFactory.adaptive_card(
+            {
+                "type": "AdaptiveCard",
+                "version": "1.5",
+                "body": [
                     {
-                        "type": "Action.ShowCard",
-                        "title": "Show/hide SQL query",
-                        "card": {
-                            "type": "AdaptiveCard",
-                            "body": [
-                                {
-                                    "type": "CodeBlock",
-                                    "codeSnippet": sqlparse.format(
-                                        query, reindent=True, keyword_case="upper"
-                                    ),
-                                    "language": "Sql",
-                                }
-                            ],
-                        },
-                    }
+                        "type": "TextBlock",
+                        "text": title,
+                        "wrap": True,
+                        "size": "Large",
+                        "weight": "Bolder",
+                    },
+                    {
+                        "type": "Container",
+                        "layouts": [
+                            {"type": "Layout.Flow", "horizontalItemsAlignment": "left"}
+                        ],
+                        "items": [
+                            {"type": "Icon", "name": "DataLine", "size": "Small"},
+                            {"type": "TextBlock", "text": response, "wrap": True},
+                        ],
+                    },
+                    element,
+                    {
+                        "type": "TextBlock",
+                        "text": f"Showing {chart.point_count:,} points summarizing "
+                        f"{chart.row_count:,} rows. Export the result for full detail.",
+                        "wrap": True,
+                        "size": "Small",
+                        "isSubtle": True,
+                    },
                 ],
+                "actions": AdaptiveCardFactory.get_result_actions(
+                    query, statement_id, refresh_data
+                ),
             }
         )
+        return AdaptiveCardFactory.get_activity([attachment])
 
+    @staticmethod
+    def get_export_action(statement_id: str, export_format: str, title: str) -> dict:
+        return {
+            "type": "Action.Submit",
+            "title": title,
+            "data": {
+                "action": "export",
+                "format": export_format,
+                "statement_id": statement_id,
+            },
+        }
+
+    @staticmethod
+    def get_export_card(
+        file_name: str, url: str, row_count: int, byte_count: int, truncated: bool
+    ) -> Activity:
+        """
+        Returns an adaptive card linking to an exported query result. A truncated
+        result is labelled as partial.
+        """
+        body = [
+            {
+                "type": "TextBlock",
+                "text": "Partial export ready" if truncated else "Export ready",
+                "wrap": True,
+                "size": "Large",
+                "weight": "Bolder",
+            },
+            {
+                "type": "TextBlock",
+                "text": f"**{file_name}**: {row_count:,} rows, "
+                f"{byte_count / 1_000_000:,.1f} MB",
+                "wrap": True,
+            },
+        ]
+        if truncated:
+            body.append(
+                {
+                    "type": "TextBlock",
+                    "text": "The query result was truncated: the file only has its "
+                    "first rows. Ask a narrower question to export every row.",
+                    "wrap": True,
+                    "color": "Warning",
+                }
+            )
+        attachment = CardFactory.adaptive_card(
+            {
+                "type": "AdaptiveCard",
+                "version": "1.5",
+                "body": body,
+                "actions": [
+                    {"type": "Action.OpenUrl", "title": "Download", "url": url}
+                ],
+            }
+        )
         return AdaptiveCardFactory.get_activity([attachment])
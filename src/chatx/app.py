@@ -12,53 +12,313 @@ Databricks' AI assistant, through a chat interface.
 Note: This is experimental code and is not intended for production use.
 """
 
+import asyncio
+import importlib
 import logging
 import os
+import time
+from typing import TYPE_CHECKING
 
 from aiohttp import web
-from botbuilder.core import (
-    BotFrameworkAdapterSettings,
-    BotFrameworkAdapter,
-    ConversationState,
-    UserState,
-    MemoryStorage,
+
+from chatx.const import (
+    APP_ID,
+    APP_PASSWORD,
+    OAUTH_CONNECTION_NAME,
+    AUTH_METHOD,
+    BOT_STORAGE,
+    DRAIN_TIMEOUT_SECONDS,
+    EXPORT_DIR,
+    EXPORT_TTL_SECONDS,
+    LOOP_MONITOR,
+    LOOP_STALL_THRESHOLD_MS,
+    SUBSCRIPTIONS,
+    SUBSCRIPTION_CONCURRENCY,
+    SUBSCRIPTION_SENDS_PER_SECOND,
+    SUBSCRIPTION_TIMEZONE,
+    WAREHOUSE_WARM_UP_SCHEDULE,
+    WAREHOUSE_WARM_UP_TIMEZONE,
 )
-from botbuilder.schema import Activity
+from chatx.loop_monitor import LoopLagMonitor
 
-from chatx.bot import MyBot
-from chatx.const import APP_ID, APP_PASSWORD, OAUTH_CONNECTION_NAME, AUTH_METHOD
+if TYPE_CHECKING:
+    from botbuilder.core import BotFrameworkAdapter
 
-from chatx.login_dialog import LoginDialog
+    from chatx.bot import MyBot
 
 # Log
 logger = logging.getLogger(__name__)
 
-# Create MemoryStorage and state
-MEMORY = MemoryStorage()
-USER_STATE = UserState(MEMORY)
-CONVERSATION_STATE = ConversationState(MEMORY)
 
-# Create dialog
-DIALOG = LoginDialog(OAUTH_CONNECTION_NAME)
+class InFlightTracker:
+    """
+    Counts the turns currently being processed by this worker so that a worker being
+    recycled or stopped can finish in-flight Genie questions before exiting.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.draining = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def start(self):
+        self.count += 1
+        self._idle.clear()
+
+    def finish(self):
+        self.count -= 1
+        if self.count == 0:
+            self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Stops accepting new turns and waits for in-flight ones to finish.
+        :param timeout: Maximum number of seconds to wait.
+        :return: True if every in-flight turn finished within the timeout.
+        """
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except TimeoutError:
+            return False
+
+
+# Imported in the background once the worker is listening, rather than when this
+# module is imported: together they take seconds to import.
+HEAVY_MODULES = (
+    "botbuilder.core",
+    "botbuilder.dialogs",
+    "botbuilder.schema",
+    "databricks.sdk",
+    "sqlparse",
+    "chatx.bot",
+    "chatx.login_dialog",
+    "chatx.storage",
+    "chatx.subscriptions",
+)
+
+IN_FLIGHT = web.AppKey("in_flight", InFlightTracker)
+# Resolves to the bot and its adapter once warm-up is done
+WARM_UP: web.AppKey["asyncio.Task[tuple[MyBot, BotFrameworkAdapter]]"] = web.AppKey(
+    "warm_up"
+)
+WAREHOUSE_SCHEDULE = web.AppKey("warehouse_schedule", asyncio.Task)
+SUBSCRIPTION_SCHEDULER = web.AppKey("subscription_scheduler", asyncio.Task)
+LOOP_LAG_MONITOR = web.AppKey("loop_lag_monitor", LoopLagMonitor)
+
+
+def import_heavy_modules():
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+
+
+async def warm_up() -> tuple["MyBot", "BotFrameworkAdapter"]:
+    """
+    Imports the heavy modules off the event loop, then builds the bot and adapter.
+    """
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, import_heavy_modules)
+
+    from botbuilder.core import (
+        BotFrameworkAdapterSettings,
+        BotFrameworkAdapter,
+        ConversationState,
+        UserState,
+    )
+
+    from chatx.bot import MyBot
+    from chatx.login_dialog import LoginDialog
+    from chatx.storage import create_storage
+    from chatx.subscriptions import SubscriptionStore
+
+    storage = create_storage(BOT_STORAGE)
+    user_state = UserState(storage)
+    conversation_state = ConversationState(storage)
+
+    dialog = LoginDialog(OAUTH_CONNECTION_NAME)
+    bot = MyBot(
+        conversation_state,
+        user_state,
+        dialog,
+        auth_method=AUTH_METHOD,
+        subscription_store=SubscriptionStore(storage),
+    )
+
+    await bot.renderer.start()
+
+    settings = BotFrameworkAdapterSettings(APP_ID, APP_PASSWORD)
+    adapter = BotFrameworkAdapter(settings)
+    logger.info(f"Warm-up done in {time.perf_counter() - started:.2f}s")
+    return bot, adapter
+
+
+async def start_warm_up(app: web.Application):
+    app[WARM_UP] = asyncio.create_task(warm_up())
+
+
+async def stop_warm_up(app: web.Application):
+    app[WARM_UP].cancel()
+
+
+async def run_warehouse_schedule(app: web.Application):
+    """
+    Warms up the warehouses of every space at the times of WAREHOUSE_WARM_UP_SCHEDULE,
+    with the service principal credentials.
+    """
+    bot, _ = await asyncio.shield(app[WARM_UP])
+
+    from chatx.const import SPACES
+    from chatx.genie import GenieQuerier
+    from chatx.schedule import WeeklySchedule
+
+    schedule = WeeklySchedule.parse(
+        WAREHOUSE_WARM_UP_SCHEDULE, WAREHOUSE_WARM_UP_TIMEZONE
+    )
+    genie_querier = GenieQuerier()
+    if genie_querier.auth_method != "service_principal":
+        logger.warning(
+            "WAREHOUSE_WARM_UP_SCHEDULE needs DATABRICKS_CLIENT_ID and "
+            "DATABRICKS_CLIENT_SECRET; scheduled warm-ups are disabled"
+        )
+        return
+    await bot.warehouse_warmer.run_schedule(
+        schedule, genie_querier, list(SPACES.values())
+    )
+
 
-# Create Bot
-BOT = MyBot(CONVERSATION_STATE, USER_STATE, DIALOG, auth_method=AUTH_METHOD)
+async def start_warehouse_schedule(app: web.Application):
+    if WAREHOUSE_WARM_UP_SCHEDULE:
+        app[WAREHOUSE_SCHEDULE] = asyncio.create_task(run_warehouse_schedule(app))
 
-SETTINGS = BotFrameworkAdapterSettings(APP_ID, APP_PASSWORD)
-ADAPTER = BotFrameworkAdapter(SETTINGS)
+
+async def stop_warehouse_schedule(app: web.Application):
+    if WAREHOUSE_SCHEDULE in app:
+        app[WAREHOUSE_SCHEDULE].cancel()
+
+
+async def run_subscription_scheduler(app: web.Application):
+    """
+    Asks subscribed questions at their scheduled times and sends the answers.
+    """
+    bot, adapter = await asyncio.shield(app[WARM_UP])
+
+    from chatx.subscriptions import SubscriptionScheduler
+
+    scheduler = SubscriptionScheduler(
+        bot.subscriptions,
+        adapter,
+        APP_ID,
+        SUBSCRIPTION_TIMEZONE,
+        SUBSCRIPTION_SENDS_PER_SECOND,
+        SUBSCRIPTION_CONCURRENCY,
+        renderer=bot.renderer,
+        exportable=bot.exportable,
+    )
+    await scheduler.run()
+
+
+async def start_subscription_scheduler(app: web.Application):
+    if SUBSCRIPTIONS:
+        app[SUBSCRIPTION_SCHEDULER] = asyncio.create_task(
+            run_subscription_scheduler(app)
+        )
+
+
+async def stop_subscription_scheduler(app: web.Application):
+    if SUBSCRIPTION_SCHEDULER in app:
+        app[SUBSCRIPTION_SCHEDULER].cancel()
+
+
+async def start_loop_monitor(app: web.Application):
+    if LOOP_MONITOR:
+        monitor = LoopLagMonitor(
+            asyncio.get_running_loop(), LOOP_STALL_THRESHOLD_MS / 1000
+        )
+        monitor.start()
+        app[LOOP_LAG_MONITOR] = monitor
+
+
+async def stop_loop_monitor(app: web.Application):
+    if LOOP_LAG_MONITOR in app:
+        app[LOOP_LAG_MONITOR].stop()
+
+
+async def stop_renderer(app: web.Application):
+    task = app[WARM_UP]
+    if task.done() and not task.cancelled() and task.exception() is None:
+        bot, _ = task.result()
+        bot.renderer.shutdown()
+
+
+async def ready(req: web.Request) -> web.Response:
+    """
+    Readiness probe: succeeds once warm-up is done and the worker is not draining.
+    """
+    task = req.app[WARM_UP]
+    if req.app[IN_FLIGHT].draining:
+        return web.json_response({"status": "draining"}, status=503)
+    if not task.done():
+        return web.json_response({"status": "warming up"}, status=503)
+    if task.cancelled() or task.exception() is not None:
+        return web.json_response({"status": "failed"}, status=503)
+    return web.json_response({"status": "ready"})
+
+
+async def health(req: web.Request) -> web.Response:
+    """
+    Liveness probe: succeeds as soon as the worker is listening. Also reports the
+    event loop stalls seen by this worker.
+    """
+    body = {"status": "ok"}
+    if LOOP_LAG_MONITOR in req.app:
+        body["event_loop"] = req.app[LOOP_LAG_MONITOR].summary()
+    return web.json_response(body)
+
+
+async def download_export(req: web.Request) -> web.StreamResponse:
+    """
+    Serves a file exported from a query result. The unguessable file name in the
+    link is what authorizes the download; files expire after EXPORT_TTL_SECONDS.
+    """
+    from chatx.export import EXPORT_FORMATS, find_export
+
+    path = find_export(EXPORT_DIR, req.match_info["name"], EXPORT_TTL_SECONDS)
+    if path is None:
+        return web.Response(status=404)
+    return web.FileResponse(
+        path,
+        headers={
+            "Content-Type": EXPORT_FORMATS[path.suffix.removeprefix(".")],
+            "Content-Disposition": f'attachment; filename="query_result{path.suffix}"',
+        },
+    )
 
 
 async def messages(req: web.Request) -> web.Response:
+    in_flight = req.app[IN_FLIGHT]
+    if in_flight.draining:
+        # Bot Framework retries, and the retry lands on a worker that is not stopping
+        return web.Response(status=503)
+
     if "application/json" in req.headers["Content-Type"]:
         body = await req.json()
     else:
         return web.Response(status=415)
 
-    activity = Activity().deserialize(body)
     auth_header = req.headers.get("Authorization", "")
 
+    in_flight.start()
     try:
-        response = await ADAPTER.process_activity(activity, auth_header, BOT.on_turn)
+        # Turns that arrive before warm-up is done wait for it instead of failing
+        bot, adapter = await asyncio.shield(req.app[WARM_UP])
+
+        from botbuilder.schema import Activity
+
+        activity = Activity().deserialize(body)
+        response = await adapter.process_activity(activity, auth_header, bot.on_turn)
         if response:
             if response.body is None:
                 args = {"status": response.status}
@@ -69,15 +329,51 @@ async def messages(req: web.Request) -> web.Response:
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}")
         return web.Response(status=500)
+    finally:
+        in_flight.finish()
+
+
+async def drain_in_flight(app: web.Application):
+    in_flight = app[IN_FLIGHT]
+    logger.info(f"Draining {in_flight.count} in-flight turn(s)")
+    if not await in_flight.drain(DRAIN_TIMEOUT_SECONDS):
+        logger.warning(
+            f"{in_flight.count} turn(s) still in flight after {DRAIN_TIMEOUT_SECONDS}s"
+        )
+
+
+async def create_app() -> web.Application:
+    """
+    Creates the bot web application. Every worker process calls this factory, so
+    each gets its own bot, adapter and event loop; user and conversation state
+    live in the storage configured by ``BOT_STORAGE`` and are shared by all workers.
 
+    The factory returns immediately: the bot is built by a background warm-up task
+    once the worker is listening, and ``/ready`` succeeds when it is done.
+    """
+    app = web.Application()
+    app[IN_FLIGHT] = InFlightTracker()
+    app.router.add_post("/api/messages", messages)
+    app.router.add_get("/api/exports/{name}", download_export)
+    app.router.add_get("/ready", ready)
+    app.router.add_get("/health", health)
+    app.on_startup.append(start_loop_monitor)
+    app.on_startup.append(start_warm_up)
+    app.on_startup.append(start_warehouse_schedule)
+    app.on_startup.append(start_subscription_scheduler)
+    app.on_shutdown.append(drain_in_flight)
+    app.on_cleanup.append(stop_subscription_scheduler)
+    app.on_cleanup.append(stop_warehouse_schedule)
+    app.on_cleanup.append(stop_renderer)
+    app.on_cleanup.append(stop_warm_up)
+    app.on_cleanup.append(stop_loop_monitor)
+    return app
 
-app = web.Application()
-app.router.add_post("/api/messages", messages)
 
 if __name__ == "__main__":
     try:
         host = os.getenv("HOST", "localhost")
         port = int(os.environ.get("PORT", 3978))
-        web.run_app(app, host=host, port=port)
+        web.run_app(create_app(), host=host, port=port)
     except Exception as e:
         logger.exception(f"Error running app:  {str(e)}")
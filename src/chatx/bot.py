@@ -1,7 +1,16 @@
+import asyncio
 import json
 import logging
-
-from botbuilder.core import ActivityHandler, TurnContext, ConversationState, UserState
+import re
+import time
+
+from botbuilder.core import (
+    ActivityHandler,
+    TurnContext,
+    ConversationState,
+    MemoryStorage,
+    UserState,
+)
 from botbuilder.dialogs import Dialog
 from botbuilder.schema import ChannelAccount, TokenResponse
 
@@ -13,18 +22,42 @@ from chatx.const import (
     WELCOME_MESSAGE,
     SPACES,
     OAUTH_CONNECTION_NAME,
+    EXPORT_DIR,
+    EXPORT_TTL_SECONDS,
+    EXPORT_WAITING_MESSAGE,
+    EXPORTABLE_STATEMENTS,
+    FAN_OUT_CONCURRENCY,
+    PUBLIC_URL,
+    LAST_RESULT_CACHE_MB,
+    REFRESH_COMMAND,
+    REFRESH_WAITING_MESSAGE,
+    RENDER_INLINE_CELLS,
+    RENDER_PROCESSES,
+    SUBSCRIBE_USAGE,
+    SUBSCRIPTION_TIMEZONE,
+    WAREHOUSE_WARM_UP,
+    WAREHOUSE_WARM_UP_COOLDOWN_SECONDS,
 )
-from chatx.genie import GenieQuerier
+from chatx.export import ExportableStatements, ExportError, ResultExporter
+from chatx.genie import GenieQuerier, RefreshError
 from chatx.helpers.dialog_helper import DialogHelper
+from chatx.rendering import ResultRenderer
+from chatx.reshape import LastResultCache
+from chatx.subscriptions import (
+    Subscription,
+    SubscriptionStore,
+    is_subscription_command,
+)
+from chatx.warehouse import WarehouseWarmer
 
 # Log
 logger = logging.getLogger(__name__)
 
 
 class MyBot(ActivityHandler):
-    # conversation_ids: dict[str, str]
-    # space_ids: dict[str, str]
-    # genie_querier: GenieQuerier
+    # Per-user space and Genie conversation IDs are kept in user_state, so that any
+    # worker process can serve any user. genie_querier only caches API clients for
+    # this process; they are rebuilt from the user's token when missing.
 
     def __init__(
         self,
@@ -32,12 +65,28 @@ class MyBot(ActivityHandler):
         user_state: UserState,
         dialog: Dialog,
         auth_method: str = "oauth",
+        subscription_store: SubscriptionStore | None = None,
     ):
-        self.conversation_ids: dict[str, str | None] = {}
-        self.space_ids: dict[str, str] = {}
         self.genie_querier: dict[str, GenieQuerier] = {}  # GenieQuerier()
         self.conversation_state = conversation_state
         self.user_state = user_state
+        self.conversation_id_accessor = user_state.create_property("ConversationId")
+        self.space_id_accessor = user_state.create_property("SpaceId")
+        # Conversation IDs of questions asked of several spaces at once, per space
+        self.space_conversations_accessor = user_state.create_property(
+            "SpaceConversationIds"
+        )
+        # Refresh data of the user's last Genie query, for the refresh command
+        self.last_answer_accessor = user_state.create_property("LastAnswer")
+        self.exporter = ResultExporter(EXPORT_DIR, PUBLIC_URL, EXPORT_TTL_SECONDS)
+        # Statements whose results the user was sent, the only ones they can export
+        self.exportable = ExportableStatements(user_state, EXPORTABLE_STATEMENTS)
+        self.warehouse_warmer = WarehouseWarmer(WAREHOUSE_WARM_UP_COOLDOWN_SECONDS)
+        self.last_results = LastResultCache(LAST_RESULT_CACHE_MB * 1_000_000)
+        self.renderer = ResultRenderer(RENDER_INLINE_CELLS, RENDER_PROCESSES)
+        # Caps the Genie questions of all fan-outs in this process
+        self.fan_out_limit = asyncio.Semaphore(FAN_OUT_CONCURRENCY)
+        self.subscriptions = subscription_store or SubscriptionStore(MemoryStorage())
         self.dialog = dialog
         assert auth_method in ["oauth", "service_principal"], (
             "auth_method should be one of ['oauth','service_principal']"
@@ -65,63 +114,79 @@ class MyBot(ActivityHandler):
             )
             return
 
-        question = turn_context.activity.text
+        # Adaptive card actions arrive as messages with a value and no text
+        question = turn_context.activity.text or ""
         user_id = str(turn_context.activity.from_property.id)
-        conversation_id = self.conversation_ids.get(user_id)
-        space_id = self.space_ids.get(user_id, "")
-
-        # Check if genie has been initialized
-        if self.genie_querier.get(user_id) is None:
-            self.genie_querier[user_id] = GenieQuerier()
+        conversation_id = await self.conversation_id_accessor.get(turn_context)
+        space_id = await self.space_id_accessor.get(turn_context, "")
 
-        if self.genie_querier[user_id].auth_method is None:
-            if self.auth_method == "oauth":
-                logger.warning(
-                    "Genie querier not initialized properly, user needs to authenticate"
-                )
-                await self._trigger_login_dialog(turn_context)
-                return await self._initialize_genie_querier_with_token(
+        # Queriers only live in this process: a turn may land on a worker that has
+        # none for the user yet, so rebuild it from the token the token service
+        # keeps and only ask the user to sign in when there is no token.
+        genie_querier = self.genie_querier.get(user_id)
+        if self.auth_method == "oauth":
+            if genie_querier is None or genie_querier.auth_method != "oauth":
+                if not await self._initialize_genie_querier_with_token(
                     turn_context, user_id
-                )
-            elif self.auth_method == "service_principal":
+                ):
+                    logger.warning("No token for the user, prompting them to sign in")
+                    return await self._trigger_login_dialog(turn_context)
+        elif genie_querier is None:
+            self.genie_querier[user_id] = GenieQuerier()
+            if self.genie_querier[user_id].auth_method is None:
                 logger.warning(
                     "auth_method is service_principal, please ensure client_id and client_secret are provided"
                 )
 
-        elif self.genie_querier[user_id].auth_method == "service_principal":
-            if self.auth_method == "oauth":
-                logger.warning(
-                    "GenieQuerier initialized with SP credentials, prompting user to login"
-                )
-                await self._trigger_login_dialog(turn_context)
-                return await self._initialize_genie_querier_with_token(
-                    turn_context, user_id
-                )
-
         # Trigger login - in case token has timed out.
         if self.auth_method == "oauth":
             await self._trigger_login_dialog(turn_context)
 
+        card_action = turn_context.activity.value
+        if isinstance(card_action, dict) and card_action.get("action") == "export":
+            return await self._export_result(turn_context, user_id, card_action)
+        if isinstance(card_action, dict) and card_action.get("action") == "refresh":
+            return await self._refresh_result(turn_context, user_id, card_action)
+
+        if is_subscription_command(question):
+            return await self._subscription_command(
+                turn_context, user_id, question, space_id
+            )
+
         # Check if genie has been initialized
         if "logout" in question.lower():
             await turn_context.send_activity("Logging you out.")
             self.genie_querier[user_id] = GenieQuerier()  # reset the genie querier
+            self.last_results.discard(user_id)
             return await turn_context.adapter.sign_out_user(
                 turn_context, OAUTH_CONNECTION_NAME, None
             )
 
+        elif question.strip().lower() == REFRESH_COMMAND:
+            refresh_data = await self.last_answer_accessor.get(turn_context)
+            if not refresh_data:
+                return await turn_context.send_activity(
+                    "There is no query result to refresh yet."
+                )
+            return await self._refresh_result(turn_context, user_id, refresh_data)
+
         elif SWITCHING_MESSAGE in question.lower():
             space_id = get_space_id(question)
             if space_id == SPACE_NOT_FOUND:
                 return await turn_context.send_activity(SPACE_NOT_FOUND)
 
-            self.space_ids[user_id] = space_id
+            await self.space_id_accessor.set(turn_context, space_id)
             # Reset conversation ID for the new space
-            self.conversation_ids.pop(user_id, None)
+            await self.conversation_id_accessor.set(turn_context, None)
             await turn_context.send_activity(
                 f"Switched to space: {REVERSE_SPACES[space_id]}"
             )
+            self._warm_up_warehouse(user_id, space_id)
         else:
+            space_ids = get_space_ids(question)
+            if len(space_ids) > 1:
+                return await self._fan_out(turn_context, user_id, question, space_ids)
+
             if not space_id or "@" in question.lower():
                 new_space_id = get_space_id(question)
                 if new_space_id == SPACE_NOT_FOUND:
@@ -131,20 +196,44 @@ class MyBot(ActivityHandler):
                 if new_space_id != space_id:
                     space_id = new_space_id
                     conversation_id = None
-                    self.space_ids[user_id] = new_space_id
-                    self.conversation_ids.pop(user_id, None)
+                    await self.space_id_accessor.set(turn_context, new_space_id)
+                    await self.conversation_id_accessor.set(turn_context, None)
                     await turn_context.send_activity(
                         f"Switched to space: {REVERSE_SPACES[space_id]}"
                     )
+                    # The warehouse starts while Genie is still generating the SQL;
+                    # this question waits for it anyway, so it is not credited
+                    self._warm_up_warehouse(user_id, space_id, credit=False)
+            # Sort, filter and top-N follow-ups are answered from the last result
+            started = time.perf_counter()
+            local_result = self.last_results.reshape(user_id, conversation_id, question)
+            if local_result is not None:
+                self.last_results.record(time.perf_counter() - started, local=True)
+                return await turn_context.send_activity(
+                    await self.renderer.render(local_result)
+                )
+
+            self.warehouse_warmer.record_question(space_id)
             try:
                 wait_activity = await turn_context.send_activity(
                     AdaptiveCardFactory.get_waiting_message()
                 )
+                started = time.perf_counter()
                 genie_result = await self.genie_querier[user_id].ask_genie(
                     question, space_id, conversation_id
                 )
-                self.conversation_ids[user_id] = genie_result.conversation_id
-                response_activity = genie_result.process_query_results()
+                self.last_results.record(time.perf_counter() - started, local=False)
+                self.last_results.put(
+                    user_id, genie_result.conversation_id, genie_result
+                )
+                await self.last_answer_accessor.set(
+                    turn_context, genie_result.refresh_data
+                )
+                await self.exportable.add(turn_context, genie_result.statement_id)
+                await self.conversation_id_accessor.set(
+                    turn_context, genie_result.conversation_id
+                )
+                response_activity = await self.renderer.render(genie_result)
                 response_activity.id = (
                     wait_activity.id
                 )  # Use the same ID to update the waiting message
@@ -165,6 +254,265 @@ class MyBot(ActivityHandler):
                         "An error occurred while processing your request."
                     )
 
+    async def _subscription_command(
+        self, turn_context: TurnContext, user_id: str, question: str, space_id: str
+    ):
+        """
+        Handles the ``subscribe``, ``subscriptions`` and ``unsubscribe`` commands.
+        Subscribed questions are asked at their scheduled times by the
+        ``SubscriptionScheduler``, and the answers are sent proactively.
+        :param turn_context: The context of the turn.
+        :param user_id: The user who sent the command.
+        :param question: The command.
+        :param space_id: The user's current space, for questions that mention none.
+        """
+        command, _, argument = question.strip().partition(" ")
+        command = command.lower()
+        argument = argument.strip()
+
+        if command == "subscriptions":
+            subscriptions = await self.subscriptions.list(user_id)
+            if not subscriptions:
+                return await turn_context.send_activity(
+                    f"You have no subscriptions. {SUBSCRIBE_USAGE}"
+                )
+            lines = [
+                f"- `{subscription.id}`: {subscription.days} {subscription.time} "
+                f"{SUBSCRIPTION_TIMEZONE} @{REVERSE_SPACES.get(subscription.space_id)}: "
+                f"{subscription.question}"
+                for subscription in subscriptions
+            ]
+            return await turn_context.send_activity(
+                "Your subscriptions:\n\n" + "\n".join(lines)
+            )
+
+        if command == "unsubscribe":
+            if not argument:
+                return await turn_context.send_activity(SUBSCRIBE_USAGE)
+            subscription_id = None if argument.lower() == "all" else argument
+            removed = await self.subscriptions.remove(user_id, subscription_id)
+            return await turn_context.send_activity(
+                f"Removed {removed} subscription(s)."
+                if removed
+                else "No matching subscription found."
+            )
+
+        if "@" in question:
+            space_id = get_space_id(question)
+        if not space_id or space_id == SPACE_NOT_FOUND:
+            return await turn_context.send_activity(SPACE_NOT_FOUND)
+        auth_scope = (
+            "service_principal"
+            if self.auth_method == "service_principal"
+            else f"user:{user_id}"
+        )
+        subscription = Subscription.parse(
+            question, user_id, space_id, auth_scope, turn_context.activity
+        )
+        if subscription is None:
+            return await turn_context.send_activity(SUBSCRIBE_USAGE)
+        await self.subscriptions.add(subscription)
+        return await turn_context.send_activity(
+            f"Subscribed (`{subscription.id}`): every {subscription.days} at "
+            f"{subscription.time} {SUBSCRIPTION_TIMEZONE}, "
+            f"@{REVERSE_SPACES[space_id]}: {subscription.question}"
+        )
+
+    async def _fan_out(
+        self,
+        turn_context: TurnContext,
+        user_id: str,
+        question: str,
+        space_ids: list[str],
+    ):
+        """
+        Asks several Genie spaces the same question concurrently. Each space keeps its
+        own conversation with the user, and each answer replaces its own waiting card
+        as soon as it arrives. The user's current space is left unchanged.
+        :param turn_context: The context of the turn.
+        :param user_id: The user who asked.
+        :param question: The question, mentioning every space to ask.
+        :param space_ids: The spaces mentioned, in order of mention.
+        """
+        conversation_ids = dict(
+            await self.space_conversations_accessor.get(turn_context, None) or {}
+        )
+        genie_querier = self.genie_querier[user_id]
+
+        # Waiting cards are sent first so the answers appear in order of mention
+        wait_activities = []
+        for space_id in space_ids:
+            wait_activities.append(
+                await turn_context.send_activity(
+                    AdaptiveCardFactory.get_waiting_message(
+                        f"Asking @{REVERSE_SPACES[space_id]}..."
+                    )
+                )
+            )
+
+        statement_ids = []
+
+        async def ask(space_id: str, wait_activity):
+            title = f"@{REVERSE_SPACES[space_id]}"
+            response_activity = None
+            try:
+                self.warehouse_warmer.record_question(space_id)
+                async with self.fan_out_limit:
+                    genie_result = await genie_querier.ask_genie(
+                        question, space_id, conversation_ids.get(space_id)
+                    )
+                conversation_ids[space_id] = genie_result.conversation_id
+                statement_ids.append(genie_result.statement_id)
+                response_activity = await self.renderer.render(genie_result, title)
+                response_activity.id = wait_activity.id
+                await turn_context.update_activity(response_activity)
+            except Exception as e:
+                if response_activity is not None and (
+                    "This channel does not support this operation" in str(e)
+                ):
+                    await turn_context.send_activity(response_activity)
+                else:
+                    logger.error(f"Error asking space {space_id}: {str(e)}")
+                    await turn_context.send_activity(
+                        f"An error occurred while asking {title}."
+                    )
+
+        await asyncio.gather(
+            *(
+                ask(space_id, wait_activity)
+                for space_id, wait_activity in zip(space_ids, wait_activities)
+            )
+        )
+        await self.space_conversations_accessor.set(turn_context, conversation_ids)
+        await self.exportable.add(turn_context, *statement_ids)
+
+    async def _export_result(
+        self, turn_context: TurnContext, user_id: str, card_action: dict
+    ):
+        """
+        Exports the full result of a statement to a file and replies with a link.
+        The result is re-fetched chunk by chunk with the user's own credentials; only
+        statements whose results were sent to the user can be exported.
+        :param turn_context: The context of the turn.
+        :param user_id: The user who clicked the export action.
+        :param card_action: The data of the export action.
+        """
+        statement_id = card_action.get("statement_id")
+        export_format = card_action.get("format", "csv")
+        if not statement_id:
+            return await turn_context.send_activity("Nothing to export.")
+        if not await self.exportable.contains(turn_context, statement_id):
+            logger.warning(
+                f"{user_id} asked to export unknown statement {statement_id}"
+            )
+            return await turn_context.send_activity(
+                "This result can no longer be exported. Please ask the question again."
+            )
+
+        response_activity = None
+        try:
+            wait_activity = await turn_context.send_activity(
+                AdaptiveCardFactory.get_waiting_message(EXPORT_WAITING_MESSAGE)
+            )
+            workspace_client = await self.genie_querier[user_id].get_workspace_client()
+            export = await self.exporter.export(
+                workspace_client, statement_id, export_format
+            )
+            response_activity = AdaptiveCardFactory.get_export_card(
+                export.file_name,
+                export.url,
+                export.row_count,
+                export.byte_count,
+                export.truncated,
+            )
+            response_activity.id = wait_activity.id
+            return await turn_context.update_activity(response_activity)
+
+        except ExportError as e:
+            return await turn_context.send_activity(str(e))
+        except Exception as e:
+            if response_activity is not None and (
+                "This channel does not support this operation" in str(e)
+            ):
+                return await turn_context.send_activity(response_activity)
+
+            logger.error(f"Error exporting statement {statement_id}: {str(e)}")
+            return await turn_context.send_activity(
+                "An error occurred while exporting the result."
+            )
+
+    async def _refresh_result(
+        self, turn_context: TurnContext, user_id: str, refresh_data: dict
+    ):
+        """
+        Re-runs the SQL of a previous answer on the space's warehouse with the user's
+        own credentials, without a new Genie generation. When the refresh action of a
+        card was clicked, that card is updated in place.
+        :param turn_context: The context of the turn.
+        :param user_id: The user who asked for the refresh.
+        :param refresh_data: The ``GenieResult.refresh_data`` of the answer.
+        """
+        space_id = refresh_data.get("space_id")
+        conversation_id = refresh_data.get("conversation_id")
+        message_id = refresh_data.get("message_id")
+        attachment_id = refresh_data.get("attachment_id")
+        if not (space_id and conversation_id and message_id and attachment_id):
+            return await turn_context.send_activity("Nothing to refresh.")
+
+        # Card actions arrive as replies to the card they were clicked on
+        card_id = (
+            turn_context.activity.reply_to_id if turn_context.activity.value else None
+        )
+        response_activity = None
+        try:
+            waiting_activity = AdaptiveCardFactory.get_waiting_message(
+                REFRESH_WAITING_MESSAGE
+            )
+            if card_id:
+                try:
+                    waiting_activity.id = card_id
+                    await turn_context.update_activity(waiting_activity)
+                except Exception as e:
+                    if "This channel does not support this operation" not in str(e):
+                        raise
+                    card_id = None
+            if not card_id:
+                card_id = (await turn_context.send_activity(waiting_activity)).id
+
+            genie_querier = self.genie_querier[user_id]
+            workspace_client = await genie_querier.get_workspace_client()
+            loop = asyncio.get_running_loop()
+            warehouse_id = await loop.run_in_executor(
+                None,
+                self.warehouse_warmer.resolve_warehouse_id,
+                workspace_client,
+                space_id,
+            )
+            if not warehouse_id:
+                raise RefreshError("No SQL warehouse was found for this Genie space.")
+
+            genie_result = await genie_querier.refresh_query(
+                space_id, conversation_id, message_id, attachment_id, warehouse_id
+            )
+            self.last_results.put(user_id, conversation_id, genie_result)
+            await self.exportable.add(turn_context, genie_result.statement_id)
+            response_activity = await self.renderer.render(genie_result)
+            response_activity.id = card_id
+            return await turn_context.update_activity(response_activity)
+
+        except RefreshError as e:
+            return await turn_context.send_activity(str(e))
+        except Exception as e:
+            if response_activity is not None and (
+                "This channel does not support this operation" in str(e)
+            ):
+                return await turn_context.send_activity(response_activity)
+
+            logger.error(f"Error refreshing message {message_id}: {str(e)}")
+            return await turn_context.send_activity(
+                "An error occurred while refreshing the result."
+            )
+
     async def on_members_added_activity(
         self, members_added: list[ChannelAccount], turn_context: TurnContext
     ):
@@ -173,8 +521,31 @@ class MyBot(ActivityHandler):
                 logger.debug(
                     f"on_members_added_activity: Member added, initializing genie querier for user: {member.id}"
                 )
-                self.genie_querier[member.id] = GenieQuerier()
+                if self.auth_method == "oauth":
+                    # Users who signed in before warm up with their own credentials
+                    await self._initialize_genie_querier_with_token(
+                        turn_context, member.id
+                    )
+                else:
+                    self.genie_querier[member.id] = GenieQuerier()
                 await turn_context.send_activity(f"v0.9 {WELCOME_MESSAGE}")
+                # Returning users go back to their space; new users have none yet
+                space_id = await self.space_id_accessor.get(turn_context, "")
+                if space_id:
+                    self._warm_up_warehouse(member.id, space_id)
+
+    def _warm_up_warehouse(self, user_id: str, space_id: str, credit: bool = True):
+        """
+        Starts the warehouse behind a space in the background with the user's
+        credentials, so their first question does not wait for a cold start.
+        """
+        genie_querier = self.genie_querier.get(user_id)
+        if not WAREHOUSE_WARM_UP or genie_querier is None:
+            return
+        if genie_querier.auth_method is None:
+            # Not signed in yet: there are no credentials to start the warehouse with
+            return
+        self.warehouse_warmer.warm_up(genie_querier, space_id, credit)
 
     async def on_turn(self, turn_context: TurnContext):
         await super().on_turn(turn_context)
@@ -240,10 +611,11 @@ class MyBot(ActivityHandler):
 
     async def _initialize_genie_querier_with_token(
         self, turn_context: TurnContext, user_id: str
-    ):
+    ) -> bool:
         """
         Initialize the genie querier with the user's token.
         :param turn_context: The context of the turn.
+        :return: True if the user has a token and the querier was initialized.
         """
         try:
             # Try to get the token from the adapter
@@ -256,12 +628,13 @@ class MyBot(ActivityHandler):
                     "_initialize_genie_querier_with_token: Token retrieved successfully, initializing GenieQuerier"
                 )
                 self.genie_querier[user_id] = GenieQuerier(token=token_response.token)
-            else:
-                logger.warning(
-                    "_initialize_genie_querier_with_token: No token available for genie querier initialization"
-                )
+                return True
+            logger.warning(
+                "_initialize_genie_querier_with_token: No token available for genie querier initialization"
+            )
         except Exception as e:
             logger.error(f"Error initializing genie querier with token: {str(e)}")
+        return False
 
     async def _is_user_authenticated(self, turn_context: TurnContext) -> bool:
         """
@@ -298,13 +671,28 @@ class MyBot(ActivityHandler):
             )
 
 
+def get_space_ids(question: str) -> list[str]:
+    """
+    Determines every Genie space mentioned in the question.
+    :param question: The question to analyze for space mentions.
+    :return: The IDs of the spaces mentioned, in order of mention.
+    """
+    positions = {}
+    for space_name, space_id in SPACES.items():
+        # "@sales" must not match "@sales_emea"
+        match = re.search(f"@{re.escape(space_name.lower())}(?!\\w)", question.lower())
+        if match and space_id not in positions:
+            positions[space_id] = match.start()
+    return sorted(positions, key=positions.__getitem__)
+
+
 def get_space_id(question: str) -> str:
     """
-    Determines the Genie space ID based on the question.
+    Determines the Genie space ID based on the question, matching mentions as
+    ``get_space_ids`` does.
     :param question: The question to analyze for space ID.
-    :return: The space ID if found, otherwise a message indicating space not found.
+    :return: The ID of the first space mentioned if any, otherwise a message
+        indicating space not found.
     """
-    for space_name, space_id in SPACES.items():
-        if "@" + space_name.lower() in question.lower():
-            return space_id
-    return SPACE_NOT_FOUND
+    space_ids = get_space_ids(question)
+    return space_ids[0] if space_ids else SPACE_NOT_FOUND
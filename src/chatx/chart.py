@@ -0,0 +1,234 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime
+
+from databricks.sdk.service.sql import ColumnInfoTypeName
+
+from chatx.columnar import ColumnarResult, DictionaryColumn, NumericColumn
+from chatx.const import CHART_MIN_ROWS
+
+# Maximum number of points drawn per line chart, across all series
+CHART_POINT_BUDGET = 300
+# Categories drawn in a bar chart; the rest are summed into "Other"
+CHART_MAX_CATEGORIES = 10
+CHART_MAX_SERIES = 5
+
+TEMPORAL_TYPES = (
+    ColumnInfoTypeName.DATE,
+    ColumnInfoTypeName.TIMESTAMP,
+)
+CATEGORICAL_TYPES = (
+    ColumnInfoTypeName.STRING,
+    ColumnInfoTypeName.CHAR,
+    ColumnInfoTypeName.BOOLEAN,
+)
+# Words of column names that identify rows rather than measure them
+KEY_WORDS = {"id", "key", "uuid"}
+# Words of column names whose values must be averaged rather than summed
+NON_ADDITIVE_WORDS = {
+    "avg",
+    "average",
+    "mean",
+    "rate",
+    "ratio",
+    "pct",
+    "percent",
+    "percentage",
+    "share",
+}
+
+
+@dataclass
+class ChartSeries:
+    name: str
+    points: list[tuple[str, float]]
+
+
+@dataclass
+class ChartSpec:
+    kind: str  # "line" or "bar"
+    x_title: str
+    series: list[ChartSeries]
+    row_count: int
+
+    @property
+    def point_count(self) -> int:
+        return sum(len(series.points) for series in self.series)
+
+
+def lttb(xs: list[float], ys: list[float], threshold: int) -> list[int]:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    :return: Indices of the points to keep, always including the first and last.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    sampled = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_count = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / avg_count
+        avg_y = sum(ys[avg_start:avg_end]) / avg_count
+
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        max_area = -1.0
+        next_a = range_start
+        for j in range(range_start, range_end):
+            area = abs(
+                (xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a])
+            )
+            if area > max_area:
+                max_area = area
+                next_a = j
+        sampled.append(next_a)
+        a = next_a
+    sampled.append(n - 1)
+    return sampled
+
+
+def top_n(totals: list[float | None], n: int) -> tuple[list[int], list[int]]:
+    """
+    Ranks categories by total, largest first.
+    :return: The codes of the top categories, and the codes of the rest. When there
+        are more than n categories, n - 1 are kept so the rest fit in an "Other" bar.
+    """
+    ranked = sorted(
+        (code for code, total in enumerate(totals) if total is not None),
+        key=totals.__getitem__,
+        reverse=True,
+    )
+    if len(ranked) <= n:
+        return ranked, []
+    return ranked[: n - 1], ranked[n - 1 :]
+
+
+def name_words(name: str) -> set[str]:
+    return set(re.split(r"[^a-z0-9]+", name.lower()))
+
+
+def is_key(name: str) -> bool:
+    return not name_words(name).isdisjoint(KEY_WORDS)
+
+
+def is_additive(name: str) -> bool:
+    return name_words(name).isdisjoint(NON_ADDITIVE_WORDS)
+
+
+def sum_by_code(
+    x_column: DictionaryColumn, measure: NumericColumn
+) -> tuple[list[float | None], list[int]]:
+    """
+    Sums a measure for each distinct value of the x column, skipping nulls.
+    :return: The sums, and the number of values summed, per value of the x column.
+    """
+    sums: list[float | None] = [None] * len(x_column.dictionary)
+    counts = [0] * len(x_column.dictionary)
+    values = measure.values
+    for index, code in enumerate(x_column.codes):
+        if x_column.is_null(index) or measure.is_null(index):
+            continue
+        current = sums[code]
+        sums[code] = values[index] if current is None else current + values[index]
+        counts[code] += 1
+    return sums, counts
+
+
+def parse_temporal(value: str) -> float | None:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+def build_chart(table: ColumnarResult | None) -> ChartSpec | None:
+    """
+    Detects whether a result is chartable, and if so builds a downsampled chart.
+
+    A result is chartable when it has enough rows, a single temporal or
+    categorical column for the x axis, and at least one numeric measure. Results
+    with an ID or key column are lists of records and stay tables. Temporal results
+    become line charts downsampled with LTTB to CHART_POINT_BUDGET points;
+    categorical results become bar charts of the top CHART_MAX_CATEGORIES categories
+    plus "Other". Rows sharing an x value are summed, or averaged for measures such
+    as averages, rates and percentages.
+    """
+    if table is None or len(table) < CHART_MIN_ROWS:
+        return None
+    if any(is_key(col.name) for col in table.schema):
+        return None
+
+    dimensions = [
+        position
+        for position, col in enumerate(table.schema)
+        if col.type_name in TEMPORAL_TYPES or col.type_name in CATEGORICAL_TYPES
+    ]
+    if len(dimensions) != 1:
+        return None
+    [x_position] = dimensions
+    kind = "line" if table.schema[x_position].type_name in TEMPORAL_TYPES else "bar"
+    if not isinstance(table.columns[x_position], DictionaryColumn):
+        return None
+
+    measures = [
+        (col.name, column)
+        for col, column in zip(table.schema, table.columns)
+        if isinstance(column, NumericColumn)
+    ][:CHART_MAX_SERIES]
+    if not measures:
+        return None
+
+    x_column = table.columns[x_position]
+    labels = x_column.dictionary
+    if kind == "line":
+        timestamps = [parse_temporal(label) for label in labels]
+        if any(timestamp is None for timestamp in timestamps):
+            return None
+        order = sorted(range(len(labels)), key=timestamps.__getitem__)
+        budget = max(CHART_POINT_BUDGET // len(measures), 3)
+
+    all_totals = []
+    for name, measure in measures:
+        sums, counts = sum_by_code(x_column, measure)
+        if is_additive(name):
+            all_totals.append((sums, sums, None))
+        else:
+            means = [
+                None if total is None else total / count
+                for total, count in zip(sums, counts)
+            ]
+            all_totals.append((means, sums, counts))
+    if kind == "bar":
+        # Every series shares the categories ranked by the first measure
+        top, rest = top_n(all_totals[0][0], CHART_MAX_CATEGORIES)
+
+    series = []
+    for (name, _), (totals, sums, counts) in zip(measures, all_totals):
+        if kind == "line":
+            codes = [code for code in order if totals[code] is not None]
+            kept = lttb(
+                [timestamps[code] for code in codes],
+                [totals[code] for code in codes],
+                budget,
+            )
+            points = [(labels[codes[i]], totals[codes[i]]) for i in kept]
+        else:
+            points = [(labels[code], totals[code] or 0.0) for code in top]
+            if rest:
+                other = sum(sums[code] or 0.0 for code in rest)
+                if counts is not None:
+                    other /= max(sum(counts[code] for code in rest), 1)
+                points.append(("Other", other))
+        series.append(ChartSeries(name=name, points=points))
+
+    return ChartSpec(
+        kind=kind,
+        x_title=table.schema[x_position].name,
+        series=series,
+        row_count=len(table),
+    )
@@ -0,0 +1,282 @@
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Iterator
+from typing import Any
+
+from databricks.sdk.service.sql import ColumnInfo, ColumnInfoTypeName, StatementResponse
+
+FLOAT_TYPES = (
+    ColumnInfoTypeName.DECIMAL,
+    ColumnInfoTypeName.DOUBLE,
+    ColumnInfoTypeName.FLOAT,
+)
+INT_TYPES = (
+    ColumnInfoTypeName.BYTE,
+    ColumnInfoTypeName.INT,
+    ColumnInfoTypeName.LONG,
+    ColumnInfoTypeName.SHORT,
+)
+
+
+def build_null_bitmap(values: list) -> bytearray | None:
+    """
+    Returns a bitmap with bit ``i`` set when ``values[i]`` is None, or None when
+    there are no nulls.
+    """
+    nulls = None
+    for index, value in enumerate(values):
+        if value is None:
+            if nulls is None:
+                nulls = bytearray((len(values) + 7) // 8)
+            nulls[index >> 3] |= 1 << (index & 7)
+    return nulls
+
+
+def smallest_code_array(codes: list[int], dictionary_size: int) -> array:
+    if dictionary_size <= 0xFF:
+        return array("B", codes)
+    if dictionary_size <= 0xFFFF:
+        return array("H", codes)
+    return array("I", codes)
+
+
+class Column(ABC):
+    """
+    A column of a query result, with nulls tracked in a bitmap.
+    """
+
+    __slots__ = ("length", "nulls")
+
+    def __init__(self, nulls: bytearray | None, length: int):
+        self.nulls = nulls
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self[index] for index in range(self.length))
+
+    @abstractmethod
+    def __getitem__(self, index: int) -> Any: ...
+
+    @abstractmethod
+    def take(self, indices: list[int]) -> "Column":
+        """
+        Returns a new column with the values at the given indices, in that order.
+        """
+
+    def _take_nulls(self, indices: list[int]) -> bytearray | None:
+        if self.nulls is None:
+            return None
+        return build_null_bitmap(
+            [None if self.is_null(index) else True for index in indices]
+        )
+
+    def is_null(self, index: int) -> bool:
+        return self.nulls is not None and bool(
+            self.nulls[index >> 3] >> (index & 7) & 1
+        )
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.nulls) if self.nulls is not None else 0
+
+
+class NumericColumn(Column):
+    """
+    Numbers stored in a typed array: ``d`` (float64) or ``q`` (int64).
+    """
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: array, nulls: bytearray | None):
+        super().__init__(nulls, len(values))
+        self.values = values
+
+    @classmethod
+    def from_values(cls, values: list, typecode: str) -> "NumericColumn":
+        convert = float if typecode == "d" else int
+        nulls = build_null_bitmap(values)
+        return cls(
+            array(typecode, (0 if v is None else convert(v) for v in values)), nulls
+        )
+
+    def __getitem__(self, index: int) -> float | int | None:
+        if self.is_null(index):
+            return None
+        return self.values[index]
+
+    def take(self, indices: list[int]) -> "NumericColumn":
+        values = self.values
+        return NumericColumn(
+            array(values.typecode, (values[index] for index in indices)),
+            self._take_nulls(indices),
+        )
+
+    def nbytes(self) -> int:
+        return super().nbytes() + sys.getsizeof(self.values)
+
+
+class DictionaryColumn(Column):
+    """
+    Strings stored once each in an interned dictionary, referenced by small
+    integer codes.
+    """
+
+    __slots__ = ("codes", "dictionary")
+
+    def __init__(self, codes: array, dictionary: list[str], nulls: bytearray | None):
+        super().__init__(nulls, len(codes))
+        self.codes = codes
+        self.dictionary = dictionary
+
+    @classmethod
+    def from_values(cls, values: list) -> "DictionaryColumn":
+        dictionary: list[str] = []
+        positions: dict[str, int] = {}
+        codes = []
+        for value in values:
+            if value is None:
+                codes.append(0)
+                continue
+            value = sys.intern(str(value))
+            code = positions.get(value)
+            if code is None:
+                code = positions[value] = len(dictionary)
+                dictionary.append(value)
+            codes.append(code)
+        return cls(
+            smallest_code_array(codes, len(dictionary)),
+            dictionary,
+            build_null_bitmap(values),
+        )
+
+    def __getitem__(self, index: int) -> str | None:
+        if self.is_null(index):
+            return None
+        return self.dictionary[self.codes[index]]
+
+    def take(self, indices: list[int]) -> "DictionaryColumn":
+        # The dictionary is shared: it is never modified once built
+        codes = self.codes
+        return DictionaryColumn(
+            array(codes.typecode, (codes[index] for index in indices)),
+            self.dictionary,
+            self._take_nulls(indices),
+        )
+
+    def nbytes(self) -> int:
+        return (
+            super().nbytes()
+            + sys.getsizeof(self.codes)
+            + sys.getsizeof(self.dictionary)
+            + sum(sys.getsizeof(value) for value in self.dictionary)
+        )
+
+
+def build_column(values: list, type_name: ColumnInfoTypeName | None) -> Column:
+    try:
+        if type_name in FLOAT_TYPES:
+            return NumericColumn.from_values(values, "d")
+        if type_name in INT_TYPES:
+            return NumericColumn.from_values(values, "q")
+    except (TypeError, ValueError, OverflowError):
+        # Values the declared type can't hold (e.g. a LONG beyond int64) stay strings
+        pass
+    return DictionaryColumn.from_values(values)
+
+
+class RowView:
+    """
+    A lightweight view of one row of a ``ColumnarResult``.
+    """
+
+    __slots__ = ("_columns", "_index")
+
+    def __init__(self, columns: list[Column], index: int):
+        self._columns = columns
+        self._index = index
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __getitem__(self, position: int) -> Any:
+        return self._columns[position][self._index]
+
+    def __iter__(self) -> Iterator[Any]:
+        return (column[self._index] for column in self._columns)
+
+    def __repr__(self) -> str:
+        return f"RowView({list(self)})"
+
+
+class ColumnarResult:
+    """
+    Compact, column-oriented copy of a statement's result rows.
+
+    The SDK returns rows as lists of strings, which costs several times the size of
+    the data in object overhead. Here numeric columns are typed arrays, other columns
+    are dictionary-encoded interned strings, and nulls are kept in bitmaps.
+    """
+
+    __slots__ = ("columns", "row_count", "schema")
+
+    def __init__(self, schema: list[ColumnInfo], columns: list[Column]):
+        self.schema = schema
+        self.columns = columns
+        self.row_count = len(columns[0]) if columns else 0
+
+    @classmethod
+    def from_rows(cls, schema: list[ColumnInfo], rows: list[list]) -> "ColumnarResult":
+        columns = [
+            build_column([row[position] for row in rows], col.type_name)
+            for position, col in enumerate(schema)
+        ]
+        return cls(schema, columns)
+
+    @classmethod
+    def from_statement_response(
+        cls, statement_response: StatementResponse
+    ) -> "ColumnarResult | None":
+        """
+        Builds the columnar result from a statement response.
+        :return: None if the response has no manifest schema or no inline rows.
+        """
+        manifest = statement_response.manifest
+        result = statement_response.result
+        if not (manifest and manifest.schema and manifest.schema.columns):
+            return None
+        if not (result and result.data_array):
+            return None
+        return cls.from_rows(manifest.schema.columns, result.data_array)
+
+    @property
+    def names(self) -> list[str]:
+        return [col.name for col in self.schema]
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def __iter__(self) -> Iterator[RowView]:
+        return (RowView(self.columns, index) for index in range(self.row_count))
+
+    def row(self, index: int) -> RowView:
+        return RowView(self.columns, index)
+
+    def column(self, name: str) -> Column:
+        return self.columns[self.names.index(name)]
+
+    def take(self, indices: list[int]) -> "ColumnarResult":
+        """
+        Returns a new result with the rows at the given indices, in that order.
+        """
+        return ColumnarResult(
+            self.schema, [column.take(indices) for column in self.columns]
+        )
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by the columns, in bytes.
+        """
+        return sum(column.nbytes() for column in self.columns)
@@ -1,6 +1,7 @@
 import json
 import logging
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -20,7 +21,74 @@ OAUTH_CONNECTION_NAME = os.getenv("OAUTH_CONNECTION_NAME", "")
 WELCOME_MESSAGE = "Welcome to the Data Query Bot!"
 WAITING_MESSAGE = "Querying Genie for results..."
 SWITCHING_MESSAGE = "switch to @"
-AUTH_METHOD = "oauth"  # can also be "service_principal"
+AUTH_METHOD = os.getenv("AUTH_METHOD", "oauth")  # can also be "service_principal"
+
+# Serving
+# "memory" keeps state per process; use "sqlite" or "sqlite:///<path>" (on a local
+# disk) when running several workers
+BOT_STORAGE = os.getenv("BOT_STORAGE", "memory")
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("DRAIN_TIMEOUT_SECONDS", "120"))
+# Base URL users reach the bot at, used for export download links
+PUBLIC_URL = os.getenv("PUBLIC_URL") or (
+    f"https://{os.environ['WEBSITE_HOSTNAME']}"
+    if os.getenv("WEBSITE_HOSTNAME")
+    else "http://localhost:3978"
+)
+
+# Exports
+EXPORT_DIR = os.getenv(
+    "EXPORT_DIR", os.path.join(tempfile.gettempdir(), "chatx-exports")
+)
+EXPORT_TTL_SECONDS = float(os.getenv("EXPORT_TTL_SECONDS", "3600"))
+# Number of each user's latest answers that can be exported
+EXPORTABLE_STATEMENTS = int(os.getenv("EXPORTABLE_STATEMENTS", "50"))
+EXPORT_WAITING_MESSAGE = "Exporting the full result..."
+
+# Questions mentioning several spaces are asked of each; this caps how many
+# Genie questions all such fan-outs run at once, per worker
+FAN_OUT_CONCURRENCY = int(os.getenv("FAN_OUT_CONCURRENCY", "4"))
+
+# Refresh
+REFRESH_COMMAND = "refresh"
+REFRESH_TIMEOUT_SECONDS = float(os.getenv("REFRESH_TIMEOUT_SECONDS", "600"))
+REFRESH_WAITING_MESSAGE = "Re-running the query..."
+
+# Subscriptions
+SUBSCRIPTIONS = os.getenv("SUBSCRIPTIONS", "true").lower() == "true"
+SUBSCRIPTION_TIMEZONE = os.getenv("SUBSCRIPTION_TIMEZONE", "UTC")
+# Proactive sends are spaced out to stay under the connector's rate limits
+SUBSCRIPTION_SENDS_PER_SECOND = float(os.getenv("SUBSCRIPTION_SENDS_PER_SECOND", "5"))
+SUBSCRIPTION_CONCURRENCY = int(os.getenv("SUBSCRIPTION_CONCURRENCY", "4"))
+SUBSCRIBE_USAGE = (
+    "To subscribe, send e.g. `subscribe mon-fri 08:30 yesterday's bookings @space` "
+    f"(times are {SUBSCRIPTION_TIMEZONE}; the days default to every day). "
+    "Send `subscriptions` to list yours and `unsubscribe <id>` or "
+    "`unsubscribe all` to stop them."
+)
+
+# Follow-ups that sort, filter or limit the last result are answered from memory
+LAST_RESULT_CACHE_MB = float(os.getenv("LAST_RESULT_CACHE_MB", "256"))
+
+# Chartable results with fewer rows are shown as a table, with every row
+CHART_MIN_ROWS = int(os.getenv("CHART_MIN_ROWS", "1000"))
+
+# Results with more cells (rows x columns) are rendered in a process pool; below
+# about this size, rendering inline is faster than the round-trip to the pool
+RENDER_INLINE_CELLS = int(os.getenv("RENDER_INLINE_CELLS", "40000"))
+# 0 renders every result inline
+RENDER_PROCESSES = int(os.getenv("RENDER_PROCESSES", "2"))
+# Event loop stalls longer than this are logged with the handler that caused them
+LOOP_MONITOR = os.getenv("LOOP_MONITOR", "true").lower() == "true"
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "100"))
+
+# Warehouse warm-up
+WAREHOUSE_WARM_UP = os.getenv("WAREHOUSE_WARM_UP", "true").lower() == "true"
+WAREHOUSE_WARM_UP_COOLDOWN_SECONDS = float(
+    os.getenv("WAREHOUSE_WARM_UP_COOLDOWN_SECONDS", "600")
+)
+# e.g. "mon-fri 08:30"; scheduled warm-ups use the service principal credentials
+WAREHOUSE_WARM_UP_SCHEDULE = os.getenv("WAREHOUSE_WARM_UP_SCHEDULE", "")
+WAREHOUSE_WARM_UP_TIMEZONE = os.getenv("WAREHOUSE_WARM_UP_TIMEZONE", "UTC")
 
 # Spaces mapping in json file
 __dir = Path(__file__).parent
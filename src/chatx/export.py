@@ -0,0 +1,317 @@
+import asyncio
+import csv
+import importlib.util
+import logging
+import re
+import secrets
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from botbuilder.core import TurnContext, UserState
+    from databricks.sdk import WorkspaceClient
+    from databricks.sdk.service.sql import (
+        ColumnInfo,
+        ExternalLink,
+        StatementExecutionAPI,
+        StatementResponse,
+    )
+
+# Log
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+# Parquet export is offered only when the optional pyarrow dependency is installed
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+# Export files are named by an unguessable token: the download link is the only
+# credential needed to fetch them.
+EXPORT_NAME = re.compile(r"^[A-Za-z0-9_-]{43}\.(csv|parquet)$")
+
+
+class ExportError(Exception):
+    """Raised when a query result cannot be exported."""
+
+
+@dataclass
+class ExportResult:
+    path: Path
+    url: str
+    row_count: int
+    byte_count: int
+    seconds: float
+    # The statement's result was truncated, so the file does not hold every row
+    truncated: bool = False
+
+    @property
+    def file_name(self) -> str:
+        return f"query_result{self.path.suffix}"
+
+
+class CsvWriter:
+    def __init__(self, path: Path, schema: list["ColumnInfo"]):
+        self.path = path
+        self.schema = schema
+
+    def __enter__(self) -> "CsvWriter":
+        self.file = open(self.path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([col.name for col in self.schema])
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+    def write(self, rows: list[list]):
+        self.writer.writerows(rows)
+
+
+class ParquetWriter:
+    """
+    Writes each chunk of rows as a Parquet row group. Requires pyarrow.
+    """
+
+    def __init__(self, path: Path, schema: list["ColumnInfo"]):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ExportError(
+                "Parquet export requires pyarrow to be installed on the bot server."
+            ) from e
+        from chatx.columnar import FLOAT_TYPES, INT_TYPES
+
+        self.pa = pa
+        self.converters = []
+        fields = []
+        for col in schema:
+            if col.type_name in FLOAT_TYPES:
+                fields.append(pa.field(col.name, pa.float64()))
+                self.converters.append(float)
+            elif col.type_name in INT_TYPES:
+                fields.append(pa.field(col.name, pa.int64()))
+                self.converters.append(int)
+            else:
+                fields.append(pa.field(col.name, pa.string()))
+                self.converters.append(str)
+        self.schema = pa.schema(fields)
+        self.path = path
+        self.pq = pq
+
+    def __enter__(self) -> "ParquetWriter":
+        self.writer = self.pq.ParquetWriter(self.path, self.schema)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.writer.close()
+
+    def write(self, rows: list[list]):
+        arrays = [
+            self.pa.array(
+                [None if value is None else convert(value) for value in values],
+                type=field.type,
+            )
+            for values, convert, field in zip(zip(*rows), self.converters, self.schema)
+        ]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+
+WRITERS = {"csv": CsvWriter, "parquet": ParquetWriter}
+
+
+def fetch_external_link(link: "ExternalLink") -> list[list]:
+    import requests
+
+    response = requests.get(link.external_link, headers=link.http_headers, timeout=300)
+    response.raise_for_status()
+    return response.json()
+
+
+def iter_result_chunks(
+    statement_execution: "StatementExecutionAPI", statement: "StatementResponse"
+) -> Iterator[list[list]]:
+    """
+    Yields the rows of a statement one chunk at a time, following
+    ``next_chunk_index`` so that only one chunk is held in memory.
+    """
+    manifest = statement.manifest
+    result = statement.result
+    if result is None and manifest.total_chunk_count:
+        result = statement_execution.get_statement_result_chunk_n(
+            statement.statement_id, 0
+        )
+    while result is not None:
+        next_chunk_index = result.next_chunk_index
+        if result.data_array:
+            yield result.data_array
+        for link in result.external_links or []:
+            if manifest.format and manifest.format.value != "JSON_ARRAY":
+                raise ExportError(f"Unsupported result format: {manifest.format.value}")
+            yield fetch_external_link(link)
+            next_chunk_index = link.next_chunk_index
+        if next_chunk_index is None:
+            return
+        result = statement_execution.get_statement_result_chunk_n(
+            statement.statement_id, next_chunk_index
+        )
+
+
+def is_truncated(statement: "StatementResponse", row_count: int) -> bool:
+    """
+    Whether the rows of a statement's result are fewer than the rows of its query,
+    e.g. because Genie's statement hit the row limit.
+    """
+    manifest = statement.manifest
+    return bool(manifest.truncated) or (
+        manifest.total_row_count is not None and row_count < manifest.total_row_count
+    )
+
+
+def export_statement(
+    statement_execution: "StatementExecutionAPI",
+    statement_id: str,
+    path: Path,
+    export_format: str,
+) -> tuple[int, bool]:
+    """
+    Streams the full result of a statement to a file.
+    :return: The number of rows written, and whether the result was truncated.
+    """
+    statement = statement_execution.get_statement(statement_id)
+    state = statement.status.state.value if statement.status else None
+    if state != "SUCCEEDED":
+        raise ExportError(
+            f"The query result is no longer available (statement state: {state})."
+        )
+    if not (statement.manifest and statement.manifest.schema):
+        raise ExportError("The query result has no schema.")
+
+    row_count = 0
+    try:
+        with WRITERS[export_format](path, statement.manifest.schema.columns) as writer:
+            for rows in iter_result_chunks(statement_execution, statement):
+                writer.write(rows)
+                row_count += len(rows)
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+    return row_count, is_truncated(statement, row_count)
+
+
+def find_export(export_dir: str, name: str, ttl_seconds: float) -> Path | None:
+    """
+    Returns the path of an exported file, or None if the name is invalid or the
+    file does not exist or has expired.
+    """
+    if not EXPORT_NAME.match(name):
+        return None
+    path = Path(export_dir) / name
+    try:
+        if time.time() - path.stat().st_mtime > ttl_seconds:
+            path.unlink(missing_ok=True)
+            return None
+    except FileNotFoundError:
+        return None
+    return path
+
+
+class ExportableStatements:
+    """
+    The statements whose results were sent to each user, kept in user_state.
+
+    Export actions arrive as card submits, whose data the client can forge, so only
+    statements recorded here are exported: with service principal auth, any other
+    statement id would export a result the user was never shown.
+    """
+
+    def __init__(self, user_state: "UserState", limit: int):
+        self.user_state = user_state
+        self.accessor = user_state.create_property("ExportableStatementIds")
+        self.limit = limit
+
+    async def add(self, turn_context: "TurnContext", *statement_ids: str | None):
+        """
+        Records statements sent to the user of the turn, keeping the latest ``limit``.
+        """
+        added = [statement_id for statement_id in statement_ids if statement_id]
+        if not added:
+            return
+        recorded = await self.accessor.get(turn_context, list)
+        recorded = [
+            statement_id for statement_id in recorded if statement_id not in added
+        ] + added
+        await self.accessor.set(turn_context, recorded[-self.limit :])
+
+    async def contains(self, turn_context: "TurnContext", statement_id: str) -> bool:
+        return statement_id in await self.accessor.get(turn_context, list)
+
+
+class ResultExporter:
+    """
+    Exports full query results to files served by the bot at ``/api/exports``.
+    """
+
+    def __init__(self, export_dir: str, public_url: str, ttl_seconds: float):
+        self.export_dir = Path(export_dir)
+        self.public_url = public_url.rstrip("/")
+        self.ttl_seconds = ttl_seconds
+
+    def remove_expired(self):
+        if not self.export_dir.exists():
+            return
+        for path in self.export_dir.iterdir():
+            find_export(str(self.export_dir), path.name, self.ttl_seconds)
+
+    def _export(
+        self,
+        workspace_client: "WorkspaceClient",
+        statement_id: str,
+        path: Path,
+        export_format: str,
+    ) -> tuple[int, bool]:
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        self.remove_expired()
+        return export_statement(
+            workspace_client.statement_execution, statement_id, path, export_format
+        )
+
+    async def export(
+        self, workspace_client: "WorkspaceClient", statement_id: str, export_format: str
+    ) -> ExportResult:
+        """
+        Streams the full result of a statement to a CSV or Parquet file.
+        :param workspace_client: Client with the credentials of the user who asked.
+        :param statement_id: The statement whose result to export.
+        :param export_format: One of ``EXPORT_FORMATS``.
+        :return: The exported file and its download URL.
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ExportError(f"Unsupported export format: {export_format}")
+        name = f"{secrets.token_urlsafe(32)}.{export_format}"
+        path = self.export_dir / name
+
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        row_count, truncated = await loop.run_in_executor(
+            None, self._export, workspace_client, statement_id, path, export_format
+        )
+        seconds = time.perf_counter() - started
+        byte_count = path.stat().st_size
+        logger.info(
+            f"Exported {row_count} rows ({byte_count} bytes) of {statement_id} "
+            f"to {export_format} in {seconds:.2f}s"
+            + (" (truncated result)" if truncated else "")
+        )
+        return ExportResult(
+            path=path,
+            url=f"{self.public_url}/api/exports/{name}",
+            row_count=row_count,
+            byte_count=byte_count,
+            seconds=seconds,
+            truncated=truncated,
+        )
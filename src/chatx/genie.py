@@ -1,37 +1,85 @@
 import asyncio
 import logging
+import time
+from datetime import datetime, timezone
+from functools import partial
 
 from databricks.sdk import GenieAPI, WorkspaceClient
+from databricks.sdk.service.dashboards import GenieMessage, MessageStatus
+from databricks.sdk.service.sql import (
+    Disposition,
+    ExecuteStatementRequestOnWaitTimeout,
+    Format,
+    StatementResponse,
+    StatementState,
+)
 
-from chatx.const import DATABRICKS_HOST, DATABRICKS_CLIENT_ID, DATABRICKS_CLIENT_SECRET
+from chatx.const import (
+    DATABRICKS_HOST,
+    DATABRICKS_CLIENT_ID,
+    DATABRICKS_CLIENT_SECRET,
+    REFRESH_TIMEOUT_SECONDS,
+)
 from chatx.genie_result import GenieResult
 
 # Log
 logger = logging.getLogger(__name__)
 
+# How often a running refresh is checked, without holding an executor thread
+REFRESH_POLL_SECONDS = 1.0
+
+
+class RefreshError(Exception):
+    """Raised when a query result cannot be refreshed."""
+
 
 class GenieQuerier:
-    genie_api: GenieAPI | None
     auth_method: str | None
 
     def __init__(self, token: str | None = None):
+        # The workspace client is built on first use: constructing it resolves the
+        # workspace's auth endpoints over the network, which must not block the
+        # event loop or slow down the bot's startup.
+        self._token = token
+        self._workspace_client: WorkspaceClient | None = None
         # If token is provided, use it to authenticate
         if token is not None:
-            workspace_client = WorkspaceClient(host=DATABRICKS_HOST, token=token)
-            self.genie_api = GenieAPI(workspace_client.api_client)
             self.auth_method = "oauth"
         elif DATABRICKS_CLIENT_ID and DATABRICKS_CLIENT_SECRET:
             # Try Service Principal Secrets
-            workspace_client = WorkspaceClient(
+            self.auth_method = "service_principal"
+        else:
+            self.auth_method = None
+
+    def _build_workspace_client(self) -> WorkspaceClient:
+        if self.auth_method == "oauth":
+            return WorkspaceClient(host=DATABRICKS_HOST, token=self._token)
+        elif self.auth_method == "service_principal":
+            return WorkspaceClient(
                 host=DATABRICKS_HOST,
                 client_id=DATABRICKS_CLIENT_ID,
                 client_secret=DATABRICKS_CLIENT_SECRET,
             )
-            self.genie_api = GenieAPI(workspace_client.api_client)
-            self.auth_method = "service_principal"
-        else:
-            self.genie_api = None
-            self.auth_method = None
+        raise ValueError("GenieQuerier has no credentials to authenticate with")
+
+    async def get_workspace_client(self) -> WorkspaceClient:
+        """
+        Returns the workspace client for this user's credentials, building it in the
+        executor on first use.
+        """
+        if self._workspace_client is None:
+            loop = asyncio.get_running_loop()
+            self._workspace_client = await loop.run_in_executor(
+                None, self._build_workspace_client
+            )
+        return self._workspace_client
+
+    async def get_genie_api(self) -> GenieAPI:
+        """
+        Returns the Genie API client, building it in the executor on first use.
+        """
+        workspace_client = await self.get_workspace_client()
+        return workspace_client.genie
 
     async def ask_genie(
         self, question: str, space_id: str, conversation_id: str | None
@@ -53,59 +101,75 @@ class GenieQuerier:
                 - statement_id: ID of the executed statement
                 - statement_response: Full response from executed statements
                 - conversation_id: ID of the conversation
+                - api_calls: Number of Genie API calls made for the question
         Raises:
             Exception: Any errors during API communication or response processing are caught,
                        logged, and returned as an error message in the result.
         """
-        try:
-            loop = asyncio.get_running_loop()
+        # Upstream Genie API calls made for this question: the question itself, the
+        # polls until the message completes and the query result
+        api_calls = 0
+
+        def count_poll(message: GenieMessage):
+            nonlocal api_calls
+            api_calls += 1
+
+        def send_question() -> GenieMessage:
+            nonlocal api_calls
             if conversation_id is None:
-                initial_message = await loop.run_in_executor(
-                    None, self.genie_api.start_conversation_and_wait, space_id, question
-                )
-                conversation_id = initial_message.conversation_id
+                waiter = genie_api.start_conversation(space_id, question)
+                sent_message = waiter.response.message
             else:
-                initial_message = await loop.run_in_executor(
-                    None,
-                    self.genie_api.create_message_and_wait,
-                    space_id,
-                    conversation_id,
-                    question,
-                )
+                waiter = genie_api.create_message(space_id, conversation_id, question)
+                sent_message = waiter.response
+            api_calls += 1
+            if (
+                sent_message is not None
+                and sent_message.status == MessageStatus.COMPLETED
+            ):
+                return sent_message
+            # The waiter returns the completed message, attachments included; the
+            # callback sees every poll but the last
+            message = waiter.result(callback=count_poll)
+            api_calls += 1
+            return message
 
-            message_content = await loop.run_in_executor(
-                None,
-                self.genie_api.get_message,
-                space_id,
-                initial_message.conversation_id,
-                initial_message.message_id,
-            )
-            logger.info(f"Raw message content: {message_content}")
+        try:
+            loop = asyncio.get_running_loop()
+            genie_api = await self.get_genie_api()
+            message = await loop.run_in_executor(None, send_question)
+            conversation_id = message.conversation_id
+            logger.info(f"Raw message content: {message}")
 
-            if not message_content.attachments:
+            if not message.attachments:
                 return GenieResult(
-                    message=message_content.content,
+                    message=message.content,
                     conversation_id=conversation_id,
+                    api_calls=api_calls,
                 )
 
-            for attachment in message_content.attachments:
+            for attachment in message.attachments:
                 attachment_id = attachment.attachment_id
                 query_obj = attachment.query
 
                 if not attachment_id or not query_obj:
                     text_obj = attachment.text
-                    message = text_obj.content if text_obj else ""
-                    return GenieResult(message=message, conversation_id=conversation_id)
+                    return GenieResult(
+                        message=text_obj.content if text_obj else "",
+                        conversation_id=conversation_id,
+                        api_calls=api_calls,
+                    )
 
                 # Use the new endpoint to get query results
                 query_result = await loop.run_in_executor(
                     None,
-                    self.genie_api.get_message_query_result_by_attachment,
+                    genie_api.get_message_query_result_by_attachment,
                     space_id,
-                    initial_message.conversation_id,
-                    initial_message.message_id,
+                    conversation_id,
+                    message.message_id,
                     attachment_id,
                 )
+                api_calls += 1
 
                 logger.info(f"Raw query result: {query_result}")
 
@@ -116,6 +180,10 @@ class GenieQuerier:
                     statement_id=query_obj.statement_id,
                     conversation_id=conversation_id,
                     statement_response=query_result.statement_response,
+                    space_id=space_id,
+                    message_id=message.message_id,
+                    attachment_id=attachment_id,
+                    api_calls=api_calls,
                 )
 
                 if not response_data.statement_response:
@@ -126,7 +194,9 @@ class GenieQuerier:
                 return response_data
 
             return GenieResult(
-                message="No attachment found", conversation_id=conversation_id
+                message="No attachment found",
+                conversation_id=conversation_id,
+                api_calls=api_calls,
             )
 
         except Exception as e:
@@ -136,4 +206,102 @@ class GenieQuerier:
             return GenieResult(
                 message="An error occurred while processing your request.",
                 conversation_id=conversation_id,
+                api_calls=api_calls,
+            )
+        finally:
+            logger.info(
+                f"Genie API calls for question in space {space_id}: {api_calls}"
             )
+
+    async def _execute_statement(
+        self, workspace_client: WorkspaceClient, query: str, warehouse_id: str
+    ) -> StatementResponse:
+        """
+        Runs a statement on a warehouse and waits for it to finish. Only the API calls
+        run in the executor: the Genie questions share it, so waiting for a long query
+        must not hold one of its threads.
+        :raises RefreshError: If the statement fails or times out.
+        """
+        loop = asyncio.get_running_loop()
+        statement_execution = workspace_client.statement_execution
+        # The shortest synchronous wait: quick queries still finish in one call
+        response = await loop.run_in_executor(
+            None,
+            partial(
+                statement_execution.execute_statement,
+                statement=query,
+                warehouse_id=warehouse_id,
+                disposition=Disposition.INLINE,
+                format=Format.JSON_ARRAY,
+                wait_timeout="5s",
+                on_wait_timeout=ExecuteStatementRequestOnWaitTimeout.CONTINUE,
+            ),
+        )
+        deadline = time.monotonic() + REFRESH_TIMEOUT_SECONDS
+        while response.status.state in (StatementState.PENDING, StatementState.RUNNING):
+            if time.monotonic() > deadline:
+                await loop.run_in_executor(
+                    None, statement_execution.cancel_execution, response.statement_id
+                )
+                raise RefreshError("The query took too long to refresh.")
+            await asyncio.sleep(REFRESH_POLL_SECONDS)
+            response = await loop.run_in_executor(
+                None, statement_execution.get_statement, response.statement_id
+            )
+
+        if response.status.state != StatementState.SUCCEEDED:
+            error = response.status.error
+            reason = error.message if error and error.message else "unknown error"
+            raise RefreshError(f"The query could not be refreshed: {reason}")
+        return response
+
+    async def refresh_query(
+        self,
+        space_id: str,
+        conversation_id: str,
+        message_id: str,
+        attachment_id: str,
+        warehouse_id: str,
+    ) -> GenieResult:
+        """
+        Re-runs the SQL of a Genie query attachment on the space's warehouse, without
+        asking Genie to generate it again. The SQL is read back from the Genie message
+        rather than taken from the card, so only queries Genie wrote can be re-run.
+        :return: The refreshed result.
+        :raises RefreshError: If the attachment has no query or the query fails.
+        """
+        loop = asyncio.get_running_loop()
+        workspace_client = await self.get_workspace_client()
+        message = await loop.run_in_executor(
+            None,
+            workspace_client.genie.get_message,
+            space_id,
+            conversation_id,
+            message_id,
+        )
+        query_obj = next(
+            (
+                attachment.query
+                for attachment in message.attachments or []
+                if attachment.attachment_id == attachment_id
+            ),
+            None,
+        )
+        if query_obj is None or not query_obj.query:
+            raise RefreshError("This result has no query to refresh.")
+
+        statement_response = await self._execute_statement(
+            workspace_client, query_obj.query, warehouse_id
+        )
+        refreshed_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+        return GenieResult(
+            query_description=f"{query_obj.description or ''}\n\n"
+            f"_Refreshed {refreshed_at}_".strip(),
+            query=query_obj.query,
+            statement_id=statement_response.statement_id,
+            statement_response=statement_response,
+            conversation_id=conversation_id,
+            space_id=space_id,
+            message_id=message_id,
+            attachment_id=attachment_id,
+        )
@@ -1,11 +1,13 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import logging
 
-from databricks.sdk.service.sql import StatementResponse, ColumnInfoTypeName
+from databricks.sdk.service.sql import StatementResponse
 from databricks.sdk.service.dashboards import GenieResultMetadata
 from botbuilder.schema import Activity, ActivityTypes
 
 from chatx.adaptive_card import AdaptiveCardFactory
+from chatx.chart import build_chart
+from chatx.columnar import Column, ColumnarResult, NumericColumn
 
 # Log
 logger = logging.getLogger(__name__)
@@ -20,16 +22,55 @@ class GenieResult:
     statement_response: StatementResponse | None = None
     message: str | None = None
     conversation_id: str | None = None
-
-    def process_query_results(self) -> Activity:
+    # Identify the Genie message attachment the query came from, so it can be refreshed
+    space_id: str | None = None
+    message_id: str | None = None
+    attachment_id: str | None = None
+    # Upstream Genie API calls made to answer the question
+    api_calls: int = 0
+    table: ColumnarResult | None = field(default=None, repr=False)
+
+    def __post_init__(self):
+        # Keep the rows in columnar form only: the SDK's list of lists of strings
+        # costs several times the size of the data.
+        if self.table is None and self.statement_response:
+            self.table = ColumnarResult.from_statement_response(self.statement_response)
+            if self.table is not None:
+                self.statement_response.result.data_array = None
+
+    @property
+    def refresh_data(self) -> dict | None:
+        """
+        The data of the card action that refreshes this result, or None if the
+        result does not come from a Genie query attachment.
+        """
+        if not (
+            self.space_id
+            and self.conversation_id
+            and self.message_id
+            and self.attachment_id
+        ):
+            return None
+        return {
+            "action": "refresh",
+            "space_id": self.space_id,
+            "conversation_id": self.conversation_id,
+            "message_id": self.message_id,
+            "attachment_id": self.attachment_id,
+        }
+
+    def process_query_results(self, title: str | None = None) -> Activity:
         """
         Processes the result from a Genie query and formats it into an Activity object.
 
         This function takes a GenieResult object, extracts relevant information such as
         query description, metadata, and query results, and formats it into a message
         activity. If the query result contains tabular data, it generates an adaptive
-        card with a table representation of the data.
+        card with a table representation of the data, or with a downsampled chart when a
+        large result has a temporal or categorical column and numeric measures.
 
+        :param title: Heading of the answer, e.g. the space it comes from. Cards are
+                titled "Results" by default.
         :returns: An Activity object containing the formatted response or an error message.
         :rtype: Activity
 
@@ -37,6 +78,8 @@ class GenieResult:
                 in the GenieResult object.
         """
         response = ""
+        # Cards show the title in their header; text answers start with it
+        heading = f"**{title}**\n\n" if title else ""
 
         if self.query_description:
             response += f"{self.query_description}\n\n"
@@ -50,21 +93,26 @@ class GenieResult:
             statement_response = self.statement_response
             logger.info(f"Found statement_response: {statement_response}")
 
-            if statement_response.result and statement_response.result.data_array:
-                manifest = statement_response.manifest
-                columns = []
-
-                if manifest and manifest.schema and manifest.schema.columns:
-                    columns = manifest.schema.columns
-                    logger.info(f"Schema columns: {columns}")
-                else:
-                    logger.warning("No manifest found in statement_response.")
+            if self.table is not None:
+                columns = self.table.schema
+                logger.info(f"Schema columns: {columns}")
+
+                chart = build_chart(self.table)
+                if chart is not None:
+                    logger.info(
+                        f"Charting {chart.row_count} rows as {chart.point_count} points"
+                    )
+                    return AdaptiveCardFactory.get_chart_card(
+                        response,
+                        chart,
+                        self.query or "No query provided",
+                        self.statement_id,
+                        self.refresh_data,
+                        title or "Results",
+                    )
 
                 col_output = [{"width": 3} for _ in columns]
 
-                data_array = statement_response.result.data_array
-                logger.info(f"Data array: {data_array}")
-
                 row_output = [
                     {
                         "type": "TableRow",
@@ -74,31 +122,27 @@ class GenieResult:
                     }
                 ]
 
-                for row in data_array:
-                    cell_output = []
-                    for value, col in zip(row, columns):
-                        if value is None:
-                            formatted_value = "NULL"
-                        elif col.type_name in [
-                            ColumnInfoTypeName.DECIMAL,
-                            ColumnInfoTypeName.DOUBLE,
-                            ColumnInfoTypeName.FLOAT,
-                        ]:
-                            formatted_value = f"{float(value):,.2f}"
-                        elif col.type_name in [
-                            ColumnInfoTypeName.INT,
-                            ColumnInfoTypeName.LONG,
-                            ColumnInfoTypeName.SHORT,
-                        ]:
-                            formatted_value = f"{int(value):,}"
-                        else:
-                            formatted_value = str(value)
-                        cell_output.append(
-                            AdaptiveCardFactory.get_cell(formatted_value)
-                        )
-                    row_output.append({"type": "TableRow", "cells": cell_output})
+                formatted_columns = [
+                    format_column(column) for column in self.table.columns
+                ]
+                for formatted_row in zip(*formatted_columns):
+                    row_output.append(
+                        {
+                            "type": "TableRow",
+                            "cells": [
+                                AdaptiveCardFactory.get_cell(value)
+                                for value in formatted_row
+                            ],
+                        }
+                    )
                 return AdaptiveCardFactory.get_table_card(
-                    response, col_output, row_output, self.query or "No query provided"
+                    response,
+                    col_output,
+                    row_output,
+                    self.query or "No query provided",
+                    self.statement_id,
+                    self.refresh_data,
+                    title or "Results",
                 )
             else:
                 logger.error(
@@ -107,11 +151,29 @@ class GenieResult:
         elif self.message:
             response += f"{self.message}\n\n"
             return Activity(
-                text=response,
+                text=heading + response,
                 type=ActivityTypes.message,
             )
         else:
             response += "No data available.\n\n"
             logger.error("No statement_response or message found in answer_json")
 
-        return Activity(text=response, type=ActivityTypes.message)
+        return Activity(text=heading + response, type=ActivityTypes.message)
+
+
+def format_column(column: Column) -> list[str]:
+    """
+    Formats every value of a result column for display.
+    Dictionary-encoded columns are formatted once per distinct value.
+    """
+    if isinstance(column, NumericColumn):
+        template = "{:,.2f}" if column.values.typecode == "d" else "{:,}"
+        return [
+            "NULL" if column.is_null(index) else template.format(value)
+            for index, value in enumerate(column.values)
+        ]
+    dictionary = column.dictionary
+    return [
+        "NULL" if column.is_null(index) else dictionary[code]
+        for index, code in enumerate(column.codes)
+    ]
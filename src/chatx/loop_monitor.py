@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+# Log
+logger = logging.getLogger(__name__)
+
+PACKAGE_PATH = "chatx"
+
+
+@dataclass
+class Stall:
+    seconds: float
+    handler: str
+    at: float  # time.time() when the stall was detected
+
+
+class LoopLagMonitor:
+    """
+    Detects event loop stalls from a watchdog thread.
+
+    The thread schedules a callback on the loop every ``interval`` seconds. If the
+    loop does not run it within ``threshold`` seconds, something is blocking the
+    loop: the thread captures the loop thread's stack to name the handler at fault,
+    then records how long the stall lasted once the loop runs the callback.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        threshold: float,
+        interval: float = 0.05,
+        max_stalls: int = 100,
+    ):
+        self.loop = loop
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls: deque[Stall] = deque(maxlen=max_stalls)
+        self.stall_count = 0
+        self.max_lag = 0.0
+        self._loop_thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """
+        Starts watching the loop. Must be called from the loop's thread.
+        """
+        self._loop_thread_id = threading.get_ident()
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-lag-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _watch(self):
+        while not self._stop.is_set():
+            responded = threading.Event()
+            sent = time.monotonic()
+            try:
+                self.loop.call_soon_threadsafe(responded.set)
+            except RuntimeError:
+                return  # the loop is closed
+
+            if not responded.wait(self.threshold):
+                handler = self.describe_loop_thread()
+                while not responded.wait(self.interval):
+                    if self._stop.is_set():
+                        return
+                self.record(time.monotonic() - sent, handler)
+            else:
+                self.max_lag = max(self.max_lag, time.monotonic() - sent)
+            self._stop.wait(self.interval)
+
+    def record(self, seconds: float, handler: str):
+        self.stall_count += 1
+        self.max_lag = max(self.max_lag, seconds)
+        self.stalls.append(Stall(seconds=seconds, handler=handler, at=time.time()))
+        logger.warning(f"Event loop stalled for {seconds * 1000:.0f}ms in {handler}")
+
+    def describe_loop_thread(self) -> str:
+        """
+        Names what the loop thread is running: the current task and the chain of this
+        package's functions on its stack, outermost first, or the innermost frame if
+        none are ours.
+        """
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return "unknown"
+        innermost = (
+            f"{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_lineno})"
+        )
+        ours = []
+        while frame is not None:
+            if f"{PACKAGE_PATH}/" in frame.f_code.co_filename.replace("\\", "/"):
+                ours.append(frame.f_code.co_qualname)
+            frame = frame.f_back
+        task = asyncio.current_task(self.loop)
+        name = f"{task.get_name()}: " if task is not None else ""
+        return name + (" > ".join(reversed(ours)) if ours else innermost)
+
+    def summary(self) -> dict:
+        return {
+            "stalls": self.stall_count,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "recent": [
+                {"ms": round(stall.seconds * 1000, 1), "handler": stall.handler}
+                for stall in list(self.stalls)[-5:]
+            ],
+        }
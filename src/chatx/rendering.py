@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from botbuilder.schema import Activity
+
+from chatx.genie_result import GenieResult
+
+# Log
+logger = logging.getLogger(__name__)
+
+
+def render_result(genie_result: GenieResult, title: str | None) -> Activity:
+    return genie_result.process_query_results(title)
+
+
+def start_process() -> int:
+    # Unpickling this function imports the rendering modules in the process
+    return os.getpid()
+
+
+class ResultRenderer:
+    """
+    Renders Genie results into activities without stalling the event loop.
+
+    Building the card of a large table (formatting every cell, the per-cell card
+    elements and formatting the SQL) takes long enough to hold up every other turn of
+    the worker. Results with more than ``inline_cells`` cells (rows x columns) are
+    rendered in a small process pool instead; smaller ones are rendered inline,
+    where the round-trip to another process would cost more than it saves. The pool
+    is started by ``start`` when the worker starts, since starting its processes
+    takes seconds.
+    """
+
+    def __init__(self, inline_cells: int, max_processes: int):
+        self.inline_cells = inline_cells
+        self.max_processes = max_processes
+        self._pool: ProcessPoolExecutor | None = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # Started on first use; "spawn" because forking a process with running
+        # threads (the default executor) is unsafe
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                self.max_processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def start(self):
+        """
+        Starts every process of the pool and imports the rendering modules in them,
+        so that the first large result does not wait for it.
+        """
+        if self.max_processes <= 0:
+            return
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        # Submitted together, so that each one starts its own process
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(self.pool, start_process)
+                for _ in range(self.max_processes)
+            )
+        )
+        logger.info(
+            f"Started {self.max_processes} rendering processes "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+    def is_large(self, genie_result: GenieResult) -> bool:
+        table = genie_result.table
+        return table is not None and len(table) * len(table.schema) > self.inline_cells
+
+    async def render(
+        self, genie_result: GenieResult, title: str | None = None
+    ) -> Activity:
+        """
+        Renders a result as ``GenieResult.process_query_results`` does.
+        :param genie_result: The result to render.
+        :param title: Heading of the answer.
+        :return: The activity to send.
+        """
+        if self.max_processes <= 0 or not self.is_large(genie_result):
+            return genie_result.process_query_results(title)
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self.pool, render_result, genie_result, title
+            )
+        except BrokenProcessPool:
+            # A render process died (e.g. out of memory): start a new pool next time
+            logger.error("Result rendering pool is broken, restarting it")
+            self._pool = None
+            return genie_result.process_query_results(title)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
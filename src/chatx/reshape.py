@@ -0,0 +1,298 @@
+import logging
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+
+from chatx.columnar import ColumnarResult, DictionaryColumn, NumericColumn
+from chatx.genie_result import GenieResult
+
+# Log
+logger = logging.getLogger(__name__)
+
+SORT_PATTERN = re.compile(
+    r"^(?:sort|order|rank)(?: (?:that|it|this|them|these|the results?|results))?"
+    r" by (?P<column>.+?)"
+    r"(?: (?P<direction>asc|ascending|desc|descending|(?:highest|largest) first"
+    r"|(?:lowest|smallest) first))?$"
+)
+FILTER_PATTERNS = [
+    re.compile(r"^(?:only|just) (?:show |keep |include )?(?:me )?(?P<value>.+)$"),
+    re.compile(r"^(?:show|keep) (?:me )?only (?P<value>.+)$"),
+    re.compile(r"^filter (?:to|on|by|for) (?P<value>.+)$"),
+]
+FILTER_VALUE_PREFIX = re.compile(r"^(?:the )?(?:rows |results )?(?:for |in |with )?")
+LIMIT_PATTERN = re.compile(
+    r"^(?:show |give me |just )?(?:me )?(?:the )?(?P<which>top|bottom|first|last)"
+    r" (?P<count>\d+)(?: rows| results)?(?: by (?P<column>.+))?$"
+)
+
+
+@dataclass
+class Reshape:
+    """
+    A follow-up that re-shapes the previous result: a filter on a value, then a
+    sort, then a limit to the first (positive) or last (negative) rows.
+    """
+
+    filter_value: str | None = None
+    sort_column: str | None = None
+    descending: bool | None = None  # None: numbers descending, text ascending
+    limit: int | None = None
+
+    @classmethod
+    def parse(cls, question: str) -> "Reshape | None":
+        """
+        Recognizes sort, filter and top-N follow-ups such as "sort that by revenue",
+        "only show EMEA" or "top 5".
+        :return: The re-shaping, or None if the question is not one.
+        """
+        text = re.sub(r"\s+", " ", question.strip().lower()).rstrip(".!?")
+        text = text.removeprefix("please ").removesuffix(" please").strip()
+
+        if match := SORT_PATTERN.match(text):
+            direction = match.group("direction")
+            return cls(
+                sort_column=match.group("column"),
+                descending=None
+                if direction is None
+                else direction.startswith(("desc", "highest", "largest")),
+            )
+        if match := LIMIT_PATTERN.match(text):
+            count = int(match.group("count"))
+            which = match.group("which")
+            column = match.group("column")
+            if column is not None:
+                # "top 5 by revenue" sorts first; "bottom 5 by revenue" the other way
+                return cls(sort_column=column, descending=which == "top", limit=count)
+            return cls(limit=count if which in ("top", "first") else -count)
+        for pattern in FILTER_PATTERNS:
+            if match := pattern.match(text):
+                value = FILTER_VALUE_PREFIX.sub("", match.group("value")).strip("'\" ")
+                return cls(filter_value=value) if value else None
+        return None
+
+    def describe(self, sort_name: str | None, filter_name: str | None) -> str:
+        parts = []
+        if self.filter_value is not None:
+            parts.append(f"filtered to {filter_name} = {self.filter_value}")
+        if sort_name is not None:
+            order = "descending" if self.descending else "ascending"
+            parts.append(f"sorted by {sort_name} ({order})")
+        if self.limit is not None:
+            which = "first" if self.limit > 0 else "last"
+            parts.append(f"{which} {abs(self.limit)} rows")
+        return ", ".join(parts).capitalize()
+
+
+def normalize_name(name: str) -> str:
+    return re.sub(r"[\s_]+", " ", name.lower()).strip()
+
+
+def find_column(table: ColumnarResult, name: str) -> int | None:
+    """
+    Finds a column by a name as a user would type it: case and the difference
+    between spaces and underscores are ignored, and a unique partial match is enough.
+    Partial matches are on whole words, so that an ``id`` column does not match
+    "paid amount", and every word of the name must be in the column's: "revenue
+    growth" does not match a ``revenue`` column.
+    """
+    wanted = normalize_name(name)
+    names = [normalize_name(col_name) for col_name in table.names]
+    if wanted in names:
+        return names.index(wanted)
+    wanted_words = set(wanted.split())
+    partial = [
+        position
+        for position, col_name in enumerate(names)
+        if wanted_words <= set(col_name.split())
+    ]
+    return partial[0] if len(partial) == 1 else None
+
+
+def find_value(table: ColumnarResult, value: str) -> tuple[int, int] | None:
+    """
+    Finds the first text column holding a value, ignoring case.
+    :return: The column position and the value's dictionary code.
+    """
+    wanted = value.lower()
+    for position, column in enumerate(table.columns):
+        if not isinstance(column, DictionaryColumn):
+            continue
+        for code, candidate in enumerate(column.dictionary):
+            if candidate.lower() == wanted:
+                return position, code
+    return None
+
+
+def is_complete(result: GenieResult) -> bool:
+    """
+    Whether the rows held are the whole result. Genie truncates large results, and
+    filtering or ranking only some of the rows would give a wrong answer.
+    """
+    manifest = result.statement_response and result.statement_response.manifest
+    if manifest is None:
+        return True
+    if manifest.truncated:
+        return False
+    return manifest.total_row_count is None or manifest.total_row_count <= len(
+        result.table
+    )
+
+
+def apply_reshape(
+    table: ColumnarResult, reshape: Reshape
+) -> tuple[ColumnarResult, str] | None:
+    """
+    Applies a re-shaping to a result.
+    :return: The new result and a description of what was done, or None if the
+        result does not have the column or value the re-shaping refers to.
+    """
+    indices = list(range(len(table)))
+    filter_name = sort_name = None
+
+    if reshape.filter_value is not None:
+        found = find_value(table, reshape.filter_value)
+        if found is None:
+            return None
+        position, code = found
+        column = table.columns[position]
+        codes = column.codes
+        indices = [
+            index
+            for index in indices
+            if codes[index] == code and not column.is_null(index)
+        ]
+        filter_name = table.names[position]
+
+    if reshape.sort_column is not None:
+        position = find_column(table, reshape.sort_column)
+        if position is None:
+            return None
+        column = table.columns[position]
+        if reshape.descending is None:
+            reshape = replace(reshape, descending=isinstance(column, NumericColumn))
+        if isinstance(column, NumericColumn):
+            values = column.values
+        else:
+            values = [column.dictionary[code] for code in column.codes]
+        present = [index for index in indices if not column.is_null(index)]
+        nulls = [index for index in indices if column.is_null(index)]
+        present.sort(key=values.__getitem__, reverse=reshape.descending)
+        indices = present + nulls  # nulls last either way
+        sort_name = table.names[position]
+
+    if reshape.limit is not None:
+        indices = (
+            indices[: reshape.limit] if reshape.limit > 0 else indices[reshape.limit :]
+        )
+
+    return table.take(indices), reshape.describe(sort_name, filter_name)
+
+
+@dataclass
+class ReshapeStats:
+    local_answers: int = 0
+    genie_answers: int = 0
+    genie_seconds: float = 0.0
+    local_seconds: float = 0.0
+
+    @property
+    def seconds_saved(self) -> float:
+        """
+        Estimated time saved: the average Genie answer time for every local answer,
+        less the time the local answers took.
+        """
+        if not self.genie_answers:
+            return 0.0
+        average = self.genie_seconds / self.genie_answers
+        return self.local_answers * average - self.local_seconds
+
+
+class LastResultCache:
+    """
+    Keeps the last tabular result of each user's Genie conversation, so that
+    follow-ups that only sort, filter or limit it are answered locally.
+
+    Results are kept in this process only, least recently used first out once
+    ``max_bytes`` is exceeded. A follow-up handled by another worker, or whose
+    result was evicted or is not complete, simply goes to Genie.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.results: OrderedDict[str, tuple[str, GenieResult]] = OrderedDict()
+        self.sizes: dict[str, int] = {}
+        self.stats = ReshapeStats()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self.sizes.values())
+
+    def put(self, user_id: str, conversation_id: str | None, result: GenieResult):
+        self.discard(user_id)
+        if conversation_id is None or result.table is None or not is_complete(result):
+            return
+        self._store(user_id, conversation_id, result)
+
+    def _store(self, user_id: str, conversation_id: str, result: GenieResult):
+        self.discard(user_id)
+        size = result.table.nbytes()
+        if size > self.max_bytes:
+            return
+        self.results[user_id] = (conversation_id, result)
+        self.sizes[user_id] = size
+        while self.nbytes > self.max_bytes:
+            evicted, _ = self.results.popitem(last=False)
+            del self.sizes[evicted]
+
+    def discard(self, user_id: str):
+        if self.results.pop(user_id, None) is not None:
+            del self.sizes[user_id]
+
+    def reshape(
+        self, user_id: str, conversation_id: str | None, question: str
+    ) -> GenieResult | None:
+        """
+        Answers a follow-up from the user's last result, if it is a re-shaping of it.
+        :return: The re-shaped result, which also becomes the last result, or None if
+            the follow-up must go to Genie.
+        """
+        entry = self.results.get(user_id)
+        if entry is None or conversation_id is None or entry[0] != conversation_id:
+            return None
+        reshape = Reshape.parse(question)
+        if reshape is None:
+            return None
+        previous = entry[1]
+        reshaped = apply_reshape(previous.table, reshape)
+        if reshaped is None:
+            return None
+
+        table, description = reshaped
+        self.results.move_to_end(user_id)
+        result = replace(
+            previous,
+            table=table,
+            query_description=f"{description} (from the previous result)",
+            query_result_metadata=None,
+            # The statement holds the original result: exporting or refreshing it
+            # would not match what is shown
+            statement_id=None,
+            attachment_id=None,
+        )
+        # Re-shaped from a complete result: fewer rows than the statement is expected
+        self._store(user_id, conversation_id, result)
+        return result
+
+    def record(self, seconds: float, local: bool):
+        stats = self.stats
+        if local:
+            stats.local_answers += 1
+            stats.local_seconds += seconds
+            logger.info(
+                f"Answered a follow-up locally in {seconds * 1000:.1f}ms; "
+                f"{stats.local_answers} local answers saved ~{stats.seconds_saved:.1f}s"
+            )
+        else:
+            stats.genie_answers += 1
+            stats.genie_seconds += seconds
@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+from datetime import UTC, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+@dataclass
+class WeeklySchedule:
+    # (weekday, hour, minute) with Monday as 0
+    times: list[tuple[int, int, int]]
+    timezone: ZoneInfo
+
+    @classmethod
+    def parse(cls, text: str, timezone: str = "UTC") -> "WeeklySchedule":
+        """
+        Parses a schedule such as ``mon-fri 08:30`` or ``mon-fri 08:30,13:00; sat 10:00``.
+        :param text: Entries separated by ``;``, each a day or day range followed by
+            comma-separated times.
+        :param timezone: IANA time zone the times are in.
+        """
+        times = []
+        for entry in text.split(";"):
+            if not entry.strip():
+                continue
+            try:
+                days, clock = entry.split()
+                first, _, last = days.lower().partition("-")
+                start = DAYS.index(first)
+                end = DAYS.index(last or first)
+                for clock_time in clock.split(","):
+                    hour, minute = (int(part) for part in clock_time.split(":"))
+                    if not (0 <= hour < 24 and 0 <= minute < 60):
+                        raise ValueError(clock_time)
+                    for day in range(start, end + 1):
+                        times.append((day, hour, minute))
+            except ValueError as e:
+                raise ValueError(f"Invalid schedule entry: {entry!r}") from e
+        if not times:
+            raise ValueError(f"Empty schedule: {text!r}")
+        return cls(times=sorted(times), timezone=ZoneInfo(timezone))
+
+    def is_due(self, tick: datetime) -> bool:
+        """
+        Returns whether a scheduled time falls in the same minute as ``tick``, an
+        aware datetime. Each scheduled time of the tick's day is converted to an
+        instant with zoneinfo, so across DST changes a time still runs once a day: a
+        repeated time at its first occurrence, a skipped one an hour later.
+        """
+        start = tick.astimezone(UTC).replace(second=0, microsecond=0)
+        local = start.astimezone(self.timezone)
+        for weekday, hour, minute in self.times:
+            if weekday != local.weekday():
+                continue
+            scheduled = datetime.combine(
+                local.date(), time(hour, minute), self.timezone
+            )
+            if start <= scheduled < start + timedelta(minutes=1):
+                return True
+        return False
+
+    def next_run(self, now: datetime) -> datetime:
+        """
+        Returns the first scheduled time strictly after ``now``.
+        """
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        for days_ahead in range(8):
+            day = midnight + timedelta(days=days_ahead)
+            for weekday, hour, minute in self.times:
+                if weekday != day.weekday():
+                    continue
+                candidate = day.replace(hour=hour, minute=minute)
+                if candidate > now:
+                    return candidate
+        raise AssertionError("A weekly schedule always has a next run")
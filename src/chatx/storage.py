@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import sqlite3
+import tempfile
+import uuid
+from copy import deepcopy
+from pathlib import Path
+
+import jsonpickle
+from botbuilder.core import MemoryStorage, Storage, StoreItem
+
+# Log
+logger = logging.getLogger(__name__)
+
+SQLITE_PREFIX = "sqlite:///"
+# Used for BOT_STORAGE=sqlite: the temporary directory is on the instance's local disk
+DEFAULT_SQLITE_PATH = str(Path(tempfile.gettempdir()) / "chatx-bot-state.db")
+# SQLite's WAL mode needs shared memory, which these filesystems do not provide
+NETWORK_FILESYSTEMS = ("cifs", "smb3", "smbfs", "nfs", "nfs4", "9p", "fuse")
+
+
+def filesystem_type(path: str, mounts: str = "/proc/mounts") -> str | None:
+    """
+    Finds the type of the filesystem a path is on, from the longest matching mount
+    point in ``mounts``.
+    :return: The filesystem type, or None if it cannot be determined.
+    """
+    resolved = Path(path).resolve()
+    best, best_type = None, None
+    try:
+        with open(mounts) as file:
+            for line in file:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = Path(fields[1].replace("\\040", " "))
+                if resolved.is_relative_to(mount_point) and (
+                    best is None or len(mount_point.parts) > len(best.parts)
+                ):
+                    best, best_type = mount_point, fields[2]
+    except OSError:
+        return None
+    return best_type
+
+
+def is_network_path(path: str, mounts: str = "/proc/mounts") -> bool:
+    fs_type = filesystem_type(path, mounts)
+    return fs_type is not None and fs_type.split(".")[0] in NETWORK_FILESYSTEMS
+
+
+class SqliteStorage(Storage):
+    """
+    Bot state storage backed by a SQLite database file.
+
+    Every worker process on the host opens the same file, so user and conversation
+    state written by one worker is visible to the others. Items are serialized with
+    jsonpickle (the same encoder botbuilder uses for state) and e_tags follow the
+    semantics of ``MemoryStorage``.
+
+    The file should be on a local disk. On a network share (such as ``/home`` on
+    App Service) WAL mode is not enabled, since its locking does not work there, but
+    SQLite's locking on network filesystems is not reliable either.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            if is_network_path(path):
+                logger.warning(
+                    f"SQLite bot state storage {path} is on a network filesystem: "
+                    "use a local path, as locking is unreliable there"
+                )
+            else:
+                connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS bot_state "
+                "(key TEXT PRIMARY KEY, e_tag TEXT, value TEXT NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+
+    async def read(self, keys: list[str]) -> dict[str, StoreItem]:
+        if not keys:
+            return {}
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read, keys)
+
+    async def write(self, changes: dict[str, StoreItem]):
+        if changes is None:
+            raise ValueError("Changes are required when writing")
+        if not changes:
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write, deepcopy(changes))
+
+    async def delete(self, keys: list[str]):
+        if not keys:
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._delete, keys)
+
+    def _read(self, keys: list[str]) -> dict[str, StoreItem]:
+        placeholders = ",".join("?" for _ in keys)
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT key, value FROM bot_state WHERE key IN ({placeholders})",
+                keys,
+            ).fetchall()
+        return {key: jsonpickle.decode(value) for key, value in rows}
+
+    def _write(self, changes: dict[str, StoreItem]):
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for key, new_state in changes.items():
+                    self._write_item(connection, key, new_state)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _write_item(connection: sqlite3.Connection, key: str, new_state: StoreItem):
+        row = connection.execute(
+            "SELECT e_tag FROM bot_state WHERE key = ?", (key,)
+        ).fetchone()
+        old_state_etag = row[0] if row else None
+
+        new_value_etag = get_e_tag(new_state)
+        if new_value_etag == "":
+            raise ValueError("sqlite_storage.write(): etag missing")
+        if (
+            old_state_etag is not None
+            and new_value_etag is not None
+            and new_value_etag != "*"
+            and new_value_etag != old_state_etag
+        ):
+            raise KeyError(
+                "Etag conflict.\nOriginal: %s\r\nCurrent: %s"
+                % (new_value_etag, old_state_etag)
+            )
+
+        # If the original object didn't have an e_tag, don't set one (C# behavior)
+        if old_state_etag:
+            set_e_tag(new_state, uuid.uuid4().hex)
+        connection.execute(
+            "INSERT OR REPLACE INTO bot_state (key, e_tag, value) VALUES (?, ?, ?)",
+            (key, get_e_tag(new_state), jsonpickle.encode(new_state)),
+        )
+
+    def _delete(self, keys: list[str]):
+        placeholders = ",".join("?" for _ in keys)
+        with self._connect() as connection:
+            connection.execute(
+                f"DELETE FROM bot_state WHERE key IN ({placeholders})", keys
+            )
+
+
+def get_e_tag(item: StoreItem) -> str | None:
+    if isinstance(item, dict):
+        return item.get("e_tag", None)
+    return getattr(item, "e_tag", None)
+
+
+def set_e_tag(item: StoreItem, e_tag: str):
+    if isinstance(item, dict):
+        item["e_tag"] = e_tag
+    else:
+        item.e_tag = e_tag
+
+
+def create_storage(url: str) -> Storage:
+    """
+    Creates the bot state storage described by a URL.
+    :param url: ``memory`` for per-process storage, or ``sqlite:///<path>`` for storage
+        shared by every worker process on the host (``sqlite`` for a local default
+        path).
+    :return: The storage instance.
+    """
+    if not url or url == "memory":
+        return MemoryStorage()
+    if url == "sqlite":
+        url = SQLITE_PREFIX + DEFAULT_SQLITE_PATH
+    if url.startswith(SQLITE_PREFIX):
+        path = url.removeprefix(SQLITE_PREFIX)
+        logger.info(f"Using SQLite bot state storage at {path}")
+        return SqliteStorage(path)
+    raise ValueError(f"Unsupported BOT_STORAGE: {url}")
@@ -0,0 +1,365 @@
+import asyncio
+import logging
+import re
+import time
+import uuid
+from collections.abc import Callable
+from copy import deepcopy
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime, timedelta
+
+from botbuilder.core import BotAdapter, Storage, TurnContext
+from botbuilder.schema import Activity, ConversationReference
+
+from chatx.const import OAUTH_CONNECTION_NAME
+from chatx.export import ExportableStatements
+from chatx.genie import GenieQuerier
+from chatx.rendering import ResultRenderer
+from chatx.schedule import WeeklySchedule
+
+# Log
+logger = logging.getLogger(__name__)
+
+SUBSCRIBE_PATTERN = re.compile(
+    r"^subscribe\s+(?:(?P<days>[a-z]{3}(?:-[a-z]{3})?)\s+)?"
+    r"(?P<time>\d{1,2}:\d{2})\s+(?P<question>.+)$",
+    re.IGNORECASE | re.DOTALL,
+)
+UNSUBSCRIBE_PATTERN = re.compile(r"^unsubscribe(?:\s+(?:all|[0-9a-f]{8}))?$", re.I)
+SUBSCRIPTIONS_KEY = "chatx/subscriptions"
+TICK_KEY = "chatx/subscriptions/tick"
+SEND_ATTEMPTS = 3
+
+
+def is_subscription_command(text: str) -> bool:
+    """
+    Whether a message is a subscription command rather than a question that starts
+    with the same word, such as "subscriptions by plan last month".
+    """
+    text = text.strip()
+    return (
+        text.lower() in ("subscribe", "subscriptions")
+        or SUBSCRIBE_PATTERN.match(text) is not None
+        or UNSUBSCRIBE_PATTERN.match(text) is not None
+    )
+
+
+@dataclass
+class Subscription:
+    id: str
+    user_id: str
+    question: str
+    space_id: str
+    days: str
+    time: str
+    # "service_principal", or "user:<id>" when the question runs with the user's token
+    auth_scope: str
+    reference: dict
+
+    def schedule(self, timezone: str) -> WeeklySchedule:
+        return WeeklySchedule.parse(f"{self.days} {self.time}", timezone)
+
+    @property
+    def group_key(self) -> tuple[str, str, str]:
+        """
+        Subscriptions with the same key get the same answer, so it is asked once.
+        """
+        return (" ".join(self.question.lower().split()), self.space_id, self.auth_scope)
+
+    def conversation_reference(self) -> ConversationReference:
+        return ConversationReference().deserialize(self.reference)
+
+    @classmethod
+    def parse(
+        cls,
+        command: str,
+        user_id: str,
+        space_id: str,
+        auth_scope: str,
+        activity: Activity,
+    ) -> "Subscription | None":
+        """
+        Parses a command such as ``subscribe mon-fri 08:30 yesterday's bookings``.
+        The days default to every day.
+        :return: The subscription, or None if the command is not valid.
+        """
+        match = SUBSCRIBE_PATTERN.match(command.strip())
+        if match is None:
+            return None
+        days = (match.group("days") or "mon-sun").lower()
+        hour, minute = match.group("time").split(":")
+        clock = f"{int(hour):02d}:{minute}"
+        try:
+            WeeklySchedule.parse(f"{days} {clock}")
+        except ValueError:
+            return None
+        return cls(
+            id=uuid.uuid4().hex[:8],
+            user_id=user_id,
+            question=match.group("question").strip(),
+            space_id=space_id,
+            days=days,
+            time=clock,
+            auth_scope=auth_scope,
+            reference=TurnContext.get_conversation_reference(activity).serialize(),
+        )
+
+
+class SubscriptionStore:
+    """
+    Keeps subscriptions in the bot state storage, so every worker sees the same
+    subscriptions. Updates use the storage's e_tags to avoid lost writes.
+    """
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+
+    async def _read_item(self, key: str, default: dict) -> dict:
+        """
+        Reads an item, creating it first if it is missing. Items are created with an
+        e_tag so that every later write is checked against the current one.
+        """
+        items = await self.storage.read([key])
+        if key not in items:
+            try:
+                await self.storage.write({key: {**default, "e_tag": "0"}})
+            except KeyError:
+                pass  # another worker created it first
+            items = await self.storage.read([key])
+        return items[key]
+
+    async def _read(self) -> dict:
+        return await self._read_item(SUBSCRIPTIONS_KEY, {"subscriptions": []})
+
+    async def _update(self, change: Callable[[list[dict]], list[dict]]):
+        for _ in range(5):
+            item = await self._read()
+            item["subscriptions"] = change(item["subscriptions"])
+            try:
+                return await self.storage.write({SUBSCRIPTIONS_KEY: item})
+            except KeyError:
+                continue  # another worker updated the subscriptions first
+        raise RuntimeError("Could not update subscriptions")
+
+    async def list(self, user_id: str | None = None) -> list[Subscription]:
+        item = await self._read()
+        return [
+            Subscription(**subscription)
+            for subscription in item["subscriptions"]
+            if user_id is None or subscription["user_id"] == user_id
+        ]
+
+    async def add(self, subscription: Subscription):
+        await self._update(lambda subscriptions: subscriptions + [asdict(subscription)])
+
+    async def remove(self, user_id: str, subscription_id: str | None = None) -> int:
+        """
+        Removes one of a user's subscriptions, or all of them if no ID is given.
+        :return: The number of subscriptions removed.
+        """
+        removed = 0
+
+        def change(subscriptions: list[dict]) -> list[dict]:
+            nonlocal removed
+            kept = [
+                subscription
+                for subscription in subscriptions
+                if subscription["user_id"] != user_id
+                or (
+                    subscription_id is not None
+                    and subscription["id"] != subscription_id
+                )
+            ]
+            removed = len(subscriptions) - len(kept)
+            return kept
+
+        await self._update(change)
+        return removed
+
+    async def claim_tick(self, tick: datetime) -> bool:
+        """
+        Claims a scheduler tick for this worker.
+        :return: False if another worker already claimed it.
+        """
+        item = await self._read_item(TICK_KEY, {"tick": ""})
+        if item["tick"] and datetime.fromisoformat(item["tick"]) >= tick:
+            return False
+        item["tick"] = tick.isoformat()
+        try:
+            await self.storage.write({TICK_KEY: item})
+        except KeyError:
+            return False
+        return True
+
+
+class SendPacer:
+    """
+    Spaces out proactive sends to stay under the connector's rate limits.
+    """
+
+    def __init__(self, sends_per_second: float):
+        self.interval = 1 / sends_per_second
+        self.next_send = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            if self.next_send > now:
+                await asyncio.sleep(self.next_send - now)
+            self.next_send = max(now, self.next_send) + self.interval
+
+
+def is_throttled(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    return status == 429 or "Too Many Requests" in str(error)
+
+
+class SubscriptionScheduler:
+    """
+    Asks subscribed questions at their scheduled times and sends the answers to the
+    subscribers proactively.
+
+    Every minute, due subscriptions are grouped by question, space and auth scope;
+    each group is asked of Genie once and its card is sent to every subscriber in
+    the group. Each worker runs a scheduler, and the storage decides which one runs
+    each tick.
+    """
+
+    def __init__(
+        self,
+        store: SubscriptionStore,
+        adapter: BotAdapter,
+        app_id: str,
+        timezone: str,
+        sends_per_second: float,
+        concurrency: int,
+        genie_querier_factory: Callable[..., GenieQuerier] = GenieQuerier,
+        renderer: ResultRenderer | None = None,
+        exportable: ExportableStatements | None = None,
+    ):
+        self.store = store
+        self.adapter = adapter
+        self.app_id = app_id
+        self.timezone = timezone
+        self.pacer = SendPacer(sends_per_second)
+        self.limit = asyncio.Semaphore(concurrency)
+        self.genie_querier_factory = genie_querier_factory
+        self.tasks: set[asyncio.Task] = set()
+        self.renderer = renderer or ResultRenderer(inline_cells=0, max_processes=0)
+        self.exportable = exportable
+
+    async def run(self):
+        """
+        Runs a tick at the start of every minute, until cancelled.
+
+        Ticks run in the background, so a tick whose questions and sends take
+        minutes does not hold up the next ones; a tick the loop wakes up late for
+        is still run. Ticks are UTC minutes, which DST changes do not repeat or
+        skip; each subscription converts its local times to them.
+        """
+        tick = datetime.now(UTC).replace(second=0, microsecond=0)
+        try:
+            while True:
+                tick += timedelta(minutes=1)
+                delay = (tick - datetime.now(UTC)).total_seconds()
+                await asyncio.sleep(max(delay, 0))
+                task = asyncio.create_task(self._run_tick(tick))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+        finally:
+            for task in self.tasks:
+                task.cancel()
+
+    async def _run_tick(self, tick: datetime):
+        try:
+            await self.run_tick(tick)
+        except Exception as e:
+            logger.error(f"Subscription tick {tick.isoformat()} failed: {str(e)}")
+
+    async def run_tick(self, tick: datetime):
+        if not await self.store.claim_tick(tick):
+            return
+        groups: dict[tuple[str, str, str], list[Subscription]] = {}
+        for subscription in await self.store.list():
+            if subscription.schedule(self.timezone).is_due(tick):
+                groups.setdefault(subscription.group_key, []).append(subscription)
+        if not groups:
+            return
+
+        logger.info(
+            f"Subscription tick {tick.isoformat()}: "
+            f"{sum(len(group) for group in groups.values())} subscription(s) "
+            f"in {len(groups)} group(s)"
+        )
+        await asyncio.gather(*(self.run_group(group) for group in groups.values()))
+
+    async def run_group(self, subscriptions: list[Subscription]):
+        first = subscriptions[0]
+        async with self.limit:
+            genie_querier = await self._genie_querier(first)
+            statement_id = None
+            if genie_querier is None:
+                activity = Activity(
+                    text="Please sign in again to keep receiving your subscription: "
+                    f"{first.question}"
+                )
+            else:
+                genie_result = await genie_querier.ask_genie(
+                    first.question, first.space_id, None
+                )
+                statement_id = genie_result.statement_id
+                activity = await self.renderer.render(
+                    genie_result, f"Subscription: {first.question}"
+                )
+        for subscription in subscriptions:
+            await self.deliver(subscription, activity, statement_id)
+
+    async def _genie_querier(self, subscription: Subscription) -> GenieQuerier | None:
+        if subscription.auth_scope == "service_principal":
+            return self.genie_querier_factory()
+
+        # Fetch the user's token from the token service, as in a turn of theirs
+        token = None
+
+        async def get_token(turn_context: TurnContext):
+            nonlocal token
+            token_response = await turn_context.adapter.get_user_token(
+                turn_context, OAUTH_CONNECTION_NAME
+            )
+            token = token_response.token if token_response else None
+
+        await self.adapter.continue_conversation(
+            subscription.conversation_reference(), get_token, self.app_id
+        )
+        return self.genie_querier_factory(token=token) if token else None
+
+    async def deliver(
+        self,
+        subscription: Subscription,
+        activity: Activity,
+        statement_id: str | None = None,
+    ):
+        async def send(turn_context: TurnContext):
+            # Sending fills in the conversation, so each subscriber gets a copy
+            await turn_context.send_activity(deepcopy(activity))
+            if self.exportable is not None and statement_id:
+                # The subscriber can export the answer from its card
+                await self.exportable.add(turn_context, statement_id)
+                await self.exportable.user_state.save_changes(turn_context)
+
+        for attempt in range(SEND_ATTEMPTS):
+            await self.pacer.wait()
+            try:
+                return await self.adapter.continue_conversation(
+                    subscription.conversation_reference(), send, self.app_id
+                )
+            except Exception as e:
+                if not is_throttled(e) or attempt == SEND_ATTEMPTS - 1:
+                    logger.error(
+                        f"Could not deliver subscription {subscription.id} "
+                        f"to {subscription.user_id}: {str(e)}"
+                    )
+                    return
+                await asyncio.sleep(2**attempt)
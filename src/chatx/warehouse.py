@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from databricks.sdk import WorkspaceClient
+
+    from chatx.genie import GenieQuerier
+    from chatx.schedule import WeeklySchedule
+
+# Log
+logger = logging.getLogger(__name__)
+
+START_TIMEOUT = timedelta(minutes=10)
+# How often a starting warehouse is checked, without holding an executor thread
+START_POLL_SECONDS = 5.0
+
+
+@dataclass
+class WarmUpStats:
+    """
+    Warm-up metrics for the warehouse behind one Genie space.
+    """
+
+    warm_ups: int = 0  # warm-ups that started a stopped warehouse
+    already_running: int = 0  # warm-ups that found it starting or running
+    failures: int = 0
+    cold_start_seconds: float = 0.0  # time taken by the warehouse starts we fired
+    seconds_avoided: float = 0.0  # part of that time no user had to wait for
+    questions_after_warm_up: int = 0
+
+
+@dataclass
+class WarmUp:
+    started_at: float
+    cold_start_seconds: float | None = None
+    credited: bool = False
+    # Seconds after the warm-up started that a question came while it was starting
+    question_after: float | None = None
+
+
+class WarehouseWarmer:
+    """
+    Starts the SQL warehouse behind a Genie space in the background, so that the
+    user's next question does not wait for the warehouse to cold start.
+
+    A warm-up only calls the warehouses API: it reads the warehouse state and starts
+    it if it is stopped. Warm-ups of the same space within ``cooldown_seconds`` of
+    each other are skipped.
+    """
+
+    def __init__(self, cooldown_seconds: float):
+        self.cooldown_seconds = cooldown_seconds
+        self.warehouse_ids: dict[str, str | None] = {}
+        self.stats: dict[str, WarmUpStats] = defaultdict(WarmUpStats)
+        self.last_warm_up: dict[str, WarmUp] = {}
+        self.tasks: set[asyncio.Task] = set()
+
+    def resolve_warehouse_id(
+        self, workspace_client: "WorkspaceClient", space_id: str
+    ) -> str | None:
+        if space_id not in self.warehouse_ids:
+            space = workspace_client.genie.get_space(space_id)
+            self.warehouse_ids[space_id] = space.warehouse_id
+        return self.warehouse_ids[space_id]
+
+    async def _warm(
+        self, workspace_client: "WorkspaceClient", space_id: str
+    ) -> float | None:
+        """
+        Starts the space's warehouse if it is stopped, and waits until it runs.
+        Only the API calls run in the executor: the Genie questions share it, so
+        waiting for the start must not hold one of its threads.
+        :return: How long the warehouse took to start, or None if it was not stopped.
+        """
+        loop = asyncio.get_running_loop()
+        warehouses = workspace_client.warehouses
+        warehouse_id = await loop.run_in_executor(
+            None, self.resolve_warehouse_id, workspace_client, space_id
+        )
+        if not warehouse_id:
+            logger.warning(f"No warehouse found for Genie space {space_id}")
+            return None
+        warehouse = await loop.run_in_executor(None, warehouses.get, warehouse_id)
+        if warehouse.state is None or warehouse.state.value != "STOPPED":
+            return None
+
+        logger.info(f"Starting warehouse {warehouse_id} for Genie space {space_id}")
+        started = time.monotonic()
+        await loop.run_in_executor(None, warehouses.start, warehouse_id)
+        while time.monotonic() - started < START_TIMEOUT.total_seconds():
+            await asyncio.sleep(START_POLL_SECONDS)
+            warehouse = await loop.run_in_executor(None, warehouses.get, warehouse_id)
+            state = warehouse.state.value if warehouse.state else None
+            if state == "RUNNING":
+                return time.monotonic() - started
+            if state in ("DELETING", "DELETED"):
+                raise RuntimeError(f"Warehouse {warehouse_id} is {state}")
+        raise TimeoutError(f"Warehouse {warehouse_id} did not start in {START_TIMEOUT}")
+
+    def warm_up(
+        self, genie_querier: "GenieQuerier", space_id: str, credit: bool = True
+    ) -> asyncio.Task | None:
+        """
+        Fires a background warm-up of the warehouse behind a space.
+        :param genie_querier: Querier whose credentials are used to start the warehouse.
+        :param space_id: The Genie space the user is about to ask.
+        :param credit: False when the question that will use the warehouse is already
+            being asked, so the warm-up is not credited to a later one.
+        :return: The warm-up task, or None if the space was warmed up recently.
+        """
+        last = self.last_warm_up.get(space_id)
+        now = time.monotonic()
+        if last is not None and now - last.started_at < self.cooldown_seconds:
+            return None
+        warm_up = self.last_warm_up[space_id] = WarmUp(
+            started_at=now, credited=not credit
+        )
+        task = asyncio.create_task(self._run(genie_querier, space_id, warm_up))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _run(self, genie_querier: "GenieQuerier", space_id: str, warm_up: WarmUp):
+        stats = self.stats[space_id]
+        try:
+            workspace_client = await genie_querier.get_workspace_client()
+            seconds = await self._warm(workspace_client, space_id)
+        except Exception as e:
+            stats.failures += 1
+            warm_up.credited = True  # nothing was avoided
+            logger.warning(f"Warehouse warm-up failed for space {space_id}: {str(e)}")
+            return
+
+        if seconds is None:
+            stats.already_running += 1
+            warm_up.credited = True  # nothing was avoided
+            return
+        warm_up.cold_start_seconds = seconds
+        stats.warm_ups += 1
+        stats.cold_start_seconds += seconds
+        logger.info(
+            f"Warehouse for space {space_id} started in {seconds:.1f}s: {stats}"
+        )
+        if warm_up.question_after is not None and not warm_up.credited:
+            self._credit(space_id, warm_up, warm_up.question_after)
+
+    def record_question(self, space_id: str):
+        """
+        Credits the space with the cold-start time its latest warm-up saved the user.
+
+        Without the warm-up the question would have waited the full cold start; with
+        it, the question only waits for what is left of it. The saving is the time
+        between the warm-up and the question, capped at the cold start duration. A
+        question asked while the warehouse is still starting is credited once it has
+        started, and not at all if the start fails.
+        """
+        warm_up = self.last_warm_up.get(space_id)
+        if warm_up is None or warm_up.credited:
+            return
+        elapsed = time.monotonic() - warm_up.started_at
+        if warm_up.cold_start_seconds is None:
+            if warm_up.question_after is None:
+                warm_up.question_after = elapsed
+            return
+        self._credit(space_id, warm_up, elapsed)
+
+    def _credit(self, space_id: str, warm_up: WarmUp, elapsed: float):
+        elapsed = min(elapsed, warm_up.cold_start_seconds)
+        warm_up.credited = True
+        stats = self.stats[space_id]
+        stats.questions_after_warm_up += 1
+        stats.seconds_avoided += elapsed
+        logger.info(
+            f"Question on space {space_id} avoided {elapsed:.1f}s of cold start: {stats}"
+        )
+
+    async def run_schedule(
+        self,
+        schedule: "WeeklySchedule",
+        genie_querier: "GenieQuerier",
+        space_ids: list[str],
+    ):
+        """
+        Warms up every space at each time of the schedule, until cancelled.
+        """
+        while True:
+            now = datetime.now(schedule.timezone)
+            next_run = schedule.next_run(now)
+            logger.info(f"Next scheduled warehouse warm-up at {next_run.isoformat()}")
+            await asyncio.sleep((next_run - now).total_seconds())
+            for space_id in space_ids:
+                self.warm_up(genie_querier, space_id)
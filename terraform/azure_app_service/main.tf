@@ -18,7 +18,7 @@ resource "azurerm_linux_web_app" "genie_app" {
   resource_group_name = azurerm_resource_group.genie_rg.name
   service_plan_id     = azurerm_service_plan.genie_plan.id
   site_config {
-    app_command_line = "gunicorn --bind 0.0.0.0 --worker-class aiohttp.worker.GunicornWebWorker --timeout 1200 --chdir src app:app"
+    app_command_line = "gunicorn --config gunicorn.conf.py"
     application_stack {
       python_version = "3.12"
     }
@@ -28,6 +28,7 @@ resource "azurerm_linux_web_app" "genie_app" {
     "APP_PASSWORD"                   = azuread_application_password.bot.value
     "DATABRICKS_HOST"                = var.databricks_host
     "OAUTH_CONNECTION_NAME"          = "databricks"
+    "BOT_STORAGE"                    = "sqlite"
     "SCM_DO_BUILD_DURING_DEPLOYMENT" = "True"
     "DATABRICKS_CLIENT_ID"           = var.auth_method == "service-principal" ? var.databricks_spn_client_id : ""
     "DATABRICKS_CLIENT_SECRET"       = var.auth_method == "service-principal" ? var.databricks_spn_client_secret : ""
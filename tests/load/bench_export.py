@@ -0,0 +1,80 @@
+"""
+Export benchmark: streams a large statement result from the stub server to CSV
+and/or Parquet and reports throughput and peak memory.
+
+Usage:
+    python -m tests.load.bench_export --rows 2000000 --chunk-rows 50000 --format csv
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from databricks.sdk import WorkspaceClient
+
+from chatx.export import export_statement
+from tests.load.harness import free_port, peak_rss_mb, wait_until_ready
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * 4096 / (1024 * 1024)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark streaming exports.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--columns", type=int, default=6)
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    args = parser.parse_args(argv)
+
+    port = free_port()
+    stub_url = f"http://127.0.0.1:{port}"
+    stub = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "tests.load.stub_server",
+            "--port",
+            str(port),
+            "--rows",
+            str(args.rows),
+            "--columns",
+            str(args.columns),
+            "--chunk-rows",
+            str(args.chunk_rows),
+        ]
+    )
+    try:
+        asyncio.run(wait_until_ready(f"{stub_url}/stub/stats"))
+        workspace_client = WorkspaceClient(host=stub_url, token="bench")
+        statement_execution = workspace_client.statement_execution
+        with tempfile.TemporaryDirectory() as export_dir:
+            path = Path(export_dir) / f"result.{args.format}"
+            baseline = current_rss_mb()
+            started = time.perf_counter()
+            rows, _ = export_statement(statement_execution, "bench", path, args.format)
+            seconds = time.perf_counter() - started
+            size = path.stat().st_size
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print(f"format:              {args.format}")
+    print(f"rows x columns:      {rows} x {args.columns} ({args.chunk_rows} per chunk)")
+    print(f"file size:           {size / 1e6:.1f} MB")
+    print(f"duration:            {seconds:.2f} s")
+    print(
+        f"throughput:          {rows / seconds:,.0f} rows/s, {size / 1e6 / seconds:.1f} MB/s"
+    )
+    print(f"peak RSS increase:   {peak_rss_mb() - baseline:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
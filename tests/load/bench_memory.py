@@ -0,0 +1,83 @@
+"""
+Memory benchmark: query rows as returned by the SDK (a list of lists of strings)
+versus ``chatx.columnar.ColumnarResult``.
+
+Usage:
+    python -m tests.load.bench_memory --rows 100000 --columns 6
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from databricks.sdk.service.sql import ColumnInfo, ColumnInfoTypeName
+
+from chatx.columnar import ColumnarResult
+
+REGIONS = ["EMEA", "APAC", "AMER", "LATAM"]
+
+
+def make_schema(columns: int) -> list[ColumnInfo]:
+    schema = [
+        ColumnInfo(name="day", type_name=ColumnInfoTypeName.DATE),
+        ColumnInfo(name="region", type_name=ColumnInfoTypeName.STRING),
+        ColumnInfo(name="orders", type_name=ColumnInfoTypeName.LONG),
+    ]
+    schema += [
+        ColumnInfo(name=f"measure_{i}", type_name=ColumnInfoTypeName.DOUBLE)
+        for i in range(columns - len(schema))
+    ]
+    return schema
+
+
+def make_payload(rows: int, columns: int) -> str:
+    data_array = [
+        [f"2025-01-{row % 28 + 1:02d}", REGIONS[row % len(REGIONS)], str(row)]
+        + [
+            None if (row + i) % 50 == 0 else f"{row * (i + 1) + 0.25}"
+            for i in range(columns - 3)
+        ]
+        for row in range(rows)
+    ]
+    return json.dumps(data_array)
+
+
+def measure(build) -> tuple[object, int, float]:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size, elapsed
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare result memory footprints.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--columns", type=int, default=6)
+    args = parser.parse_args(argv)
+
+    schema = make_schema(args.columns)
+    payload = make_payload(args.rows, args.columns)
+
+    # Parsing JSON is how the SDK materializes data_array
+    data_array, rows_bytes, _ = measure(lambda: json.loads(payload))
+    table, table_bytes, table_s = measure(
+        lambda: ColumnarResult.from_rows(schema, data_array)
+    )
+
+    print(f"rows x columns:      {args.rows} x {args.columns}")
+    print(f"list of lists:       {rows_bytes / 1e6:10.2f} MB")
+    print(f"columnar:            {table_bytes / 1e6:10.2f} MB  (build {table_s:.3f}s)")
+    print(f"reduction:           {rows_bytes / table_bytes:10.1f}x")
+    print(
+        f"bytes per row:       {rows_bytes / args.rows:.0f} -> {table_bytes / args.rows:.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
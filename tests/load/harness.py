@@ -0,0 +1,277 @@
+"""
+Load-test harness for the bot web app.
+
+Starts the stub Genie/connector server (``tests.load.stub_server``) in a child
+process, serves ``chatx.app`` in-process against it, then drives N concurrent
+simulated users through ``/api/messages`` and reports throughput, latency
+percentiles, executor saturation and peak RSS.
+
+Usage:
+    python -m tests.load.harness --users 50 --requests 5 --latency 0.05 --rows 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+import aiohttp
+from aiohttp import web
+
+
+@dataclass
+class ExecutorStats:
+    max_workers: int
+    samples: int = 0
+    saturated_samples: int = 0
+    peak_busy: int = 0
+    peak_queue: int = 0
+
+    @property
+    def saturation(self) -> float:
+        return self.saturated_samples / self.samples if self.samples else 0.0
+
+
+@dataclass
+class LoadReport:
+    users: int
+    requests: int
+    errors: int
+    duration_s: float
+    throughput_rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    executor_saturation: float
+    executor_peak_busy: int
+    executor_peak_queue: int
+    warm_up_s: float
+    peak_rss_mb: float
+    upstream_calls: dict[str, int] = field(default_factory=dict)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(latencies: list[float], pct: int) -> float:
+    if len(latencies) < 2:
+        return latencies[0] if latencies else 0.0
+    return statistics.quantiles(latencies, n=100, method="inclusive")[pct - 1]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+async def sample_executor(
+    executor: ThreadPoolExecutor, stats: ExecutorStats, interval: float
+) -> None:
+    while True:
+        busy = min(
+            len(executor._threads) - executor._idle_semaphore._value,
+            stats.max_workers,
+        )
+        queued = executor._work_queue.qsize()
+        stats.samples += 1
+        stats.peak_busy = max(stats.peak_busy, busy)
+        stats.peak_queue = max(stats.peak_queue, queued)
+        if busy >= stats.max_workers:
+            stats.saturated_samples += 1
+        await asyncio.sleep(interval)
+
+
+def make_activity(user: str, text: str, service_url: str) -> dict:
+    return {
+        "type": "message",
+        "id": uuid.uuid4().hex,
+        "text": text,
+        "channelId": "emulator",
+        "serviceUrl": service_url,
+        "from": {"id": user, "name": user},
+        "recipient": {"id": "bot", "name": "bot"},
+        "conversation": {"id": f"conversation-{user}"},
+    }
+
+
+async def simulate_user(
+    session: aiohttp.ClientSession,
+    bot_url: str,
+    service_url: str,
+    user: str,
+    questions: list[str],
+    latencies: list[float],
+) -> int:
+    errors = 0
+    for question in questions:
+        start = time.perf_counter()
+        async with session.post(
+            f"{bot_url}/api/messages", json=make_activity(user, question, service_url)
+        ) as response:
+            await response.read()
+            if response.status >= 400:
+                errors += 1
+        latencies.append(time.perf_counter() - start)
+    return errors
+
+
+async def run_load(args: argparse.Namespace, stub_url: str) -> LoadReport:
+    # chatx reads its configuration at import time
+    os.environ.update(
+        DATABRICKS_HOST=stub_url,
+        DATABRICKS_CLIENT_ID="load-test",
+        DATABRICKS_CLIENT_SECRET="load-test",
+        AUTH_METHOD="service_principal",
+        APP_ID="",
+        APP_PASSWORD="",
+    )
+    from chatx.app import create_app
+    from chatx.const import SPACES
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=args.executor_workers)
+    loop.set_default_executor(executor)
+    executor_stats = ExecutorStats(max_workers=args.executor_workers)
+
+    started = time.perf_counter()
+    runner = web.AppRunner(await create_app())
+    await runner.setup()
+    port = free_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    bot_url = f"http://127.0.0.1:{port}"
+    await wait_until_ready(f"{bot_url}/ready")
+    warm_up = time.perf_counter() - started
+
+    space = next(iter(SPACES))
+    questions = [f"@{space} question {i}" for i in range(args.requests)]
+    latencies: list[float] = []
+    sampler = asyncio.create_task(sample_executor(executor, executor_stats, 0.005))
+    connector = aiohttp.TCPConnector(limit=0)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await session.post(f"{stub_url}/stub/reset")
+            start = time.perf_counter()
+            errors = await asyncio.gather(
+                *(
+                    simulate_user(
+                        session, bot_url, stub_url, f"user-{i}", questions, latencies
+                    )
+                    for i in range(args.users)
+                )
+            )
+            duration = time.perf_counter() - start
+            async with session.get(f"{stub_url}/stub/stats") as response:
+                upstream_calls = await response.json()
+    finally:
+        sampler.cancel()
+        await runner.cleanup()
+        executor.shutdown(wait=False)
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    return LoadReport(
+        users=args.users,
+        requests=len(latencies_ms),
+        errors=sum(errors),
+        duration_s=round(duration, 3),
+        throughput_rps=round(len(latencies_ms) / duration, 2),
+        p50_ms=round(percentile(latencies_ms, 50), 2),
+        p95_ms=round(percentile(latencies_ms, 95), 2),
+        p99_ms=round(percentile(latencies_ms, 99), 2),
+        executor_saturation=round(executor_stats.saturation, 3),
+        executor_peak_busy=executor_stats.peak_busy,
+        executor_peak_queue=executor_stats.peak_queue,
+        warm_up_s=round(warm_up, 3),
+        peak_rss_mb=round(peak_rss_mb(), 1),
+        upstream_calls=upstream_calls,
+    )
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{url} not ready after {timeout}s")
+            await asyncio.sleep(0.02)
+
+
+async def main_async(args: argparse.Namespace) -> LoadReport:
+    port = free_port()
+    stub_url = f"http://127.0.0.1:{port}"
+    stub = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "tests.load.stub_server",
+            "--port",
+            str(port),
+            "--latency",
+            str(args.latency),
+            "--generation-time",
+            str(args.generation_time),
+            "--rows",
+            str(args.rows),
+            "--columns",
+            str(args.columns),
+            "--error-rate",
+            str(args.error_rate),
+        ]
+    )
+    try:
+        await wait_until_ready(f"{stub_url}/stub/stats")
+        return await run_load(args, stub_url)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test the bot web app.")
+    parser.add_argument("--users", type=int, default=20, help="concurrent users")
+    parser.add_argument("--requests", type=int, default=5, help="questions per user")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--generation-time", type=float, default=0.0)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--columns", type=int, default=4)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--executor-workers", type=int, default=8)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(asdict(report)))
+        return
+    for key, value in asdict(report).items():
+        if key == "upstream_calls":
+            print("upstream_calls:")
+            for route, count in sorted(value.items()):
+                print(f"  {count:>8}  {route}")
+        else:
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
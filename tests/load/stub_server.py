@@ -0,0 +1,308 @@
+"""
+Stub upstream services for load-testing the bot locally.
+
+A single aiohttp app serves two sets of routes:
+
+- the Databricks Genie conversation endpoints (plus the OAuth M2M endpoints the SDK
+  needs to authenticate a service principal), with configurable latency, result
+  sizes and error rate;
+- the Bot Framework connector endpoints used by ``send_activity`` and
+  ``update_activity``, which accept and count every activity.
+
+Every upstream request is counted per route; ``GET /stub/stats`` returns the counters
+and ``POST /stub/reset`` clears them.
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+
+from aiohttp import web
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.0  # seconds added to every Genie request
+    generation_time: float = 0.0  # seconds a message stays in progress before COMPLETED
+    rows: int = 20
+    columns: int = 4
+    chunk_rows: int = 10_000  # rows per statement result chunk
+    error_rate: float = 0.0  # fraction of questions that fail upstream
+    seed: int | None = None
+
+
+class StubServer:
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.calls: Counter[str] = Counter()
+        self.messages: dict[str, dict] = {}
+        self.activity_ids = itertools.count(1)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        genie = "/api/2.0/genie/spaces/{space_id}"
+        message = genie + "/conversations/{conversation_id}/messages/{message_id}"
+        app.router.add_get("/.well-known/databricks-config", self.host_metadata)
+        app.router.add_get("/oidc/.well-known/oauth-authorization-server", self.oidc)
+        app.router.add_post("/oidc/v1/token", self.token)
+        app.router.add_get(genie, self.get_space)
+        app.router.add_post(genie + "/start-conversation", self.start_conversation)
+        app.router.add_post(
+            genie + "/conversations/{conversation_id}/messages", self.create_message
+        )
+        app.router.add_get(message, self.get_message)
+        app.router.add_get(message + "/query-result/{attachment_id}", self.query_result)
+        app.router.add_get(
+            message + "/attachments/{attachment_id}/query-result", self.query_result
+        )
+        app.router.add_get("/api/2.0/sql/warehouses/{warehouse_id}", self.warehouse)
+        statement = "/api/2.0/sql/statements/{statement_id}"
+        app.router.add_get(statement, self.get_statement)
+        app.router.add_get(statement + "/result/chunks/{chunk_index}", self.get_chunk)
+        app.router.add_post("/v3/conversations/{conversation_id}/activities", self.send)
+        app.router.add_post(
+            "/v3/conversations/{conversation_id}/activities/{activity_id}", self.send
+        )
+        app.router.add_put(
+            "/v3/conversations/{conversation_id}/activities/{activity_id}", self.update
+        )
+        app.router.add_get("/stub/stats", self.stats)
+        app.router.add_post("/stub/reset", self.reset)
+        app.middlewares.append(self.count_calls)
+        return app
+
+    @web.middleware
+    async def count_calls(self, request: web.Request, handler):
+        if request.path.startswith("/stub/"):
+            return await handler(request)
+        route = request.match_info.route.resource
+        name = route.canonical if route is not None else request.path
+        self.calls[f"{request.method} {name}"] += 1
+        if request.path.startswith("/api/") and self.config.latency:
+            await asyncio.sleep(self.config.latency)
+        return await handler(request)
+
+    # OAuth M2M
+    async def host_metadata(self, request: web.Request) -> web.Response:
+        base = f"{request.scheme}://{request.host}"
+        return web.json_response({"oidc_endpoint": f"{base}/oidc", "workspace_id": "1"})
+
+    async def oidc(self, request: web.Request) -> web.Response:
+        base = f"{request.scheme}://{request.host}/oidc/v1"
+        return web.json_response(
+            {
+                "authorization_endpoint": f"{base}/authorize",
+                "token_endpoint": f"{base}/token",
+            }
+        )
+
+    async def token(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {"access_token": "stub-token", "token_type": "Bearer", "expires_in": 3600}
+        )
+
+    # Genie
+    async def get_space(self, request: web.Request) -> web.Response:
+        space_id = request.match_info["space_id"]
+        return web.json_response(
+            {
+                "space_id": space_id,
+                "title": f"Stub space {space_id}",
+                "warehouse_id": f"wh-{space_id}",
+            }
+        )
+
+    def _new_message(self, space_id: str, conversation_id: str, content: str) -> dict:
+        message_id = uuid.uuid4().hex
+        failed = self.random.random() < self.config.error_rate
+        message = {
+            "id": message_id,
+            "message_id": message_id,
+            "conversation_id": conversation_id,
+            "space_id": space_id,
+            "content": content,
+            "status": "SUBMITTED",
+            "created": time.monotonic(),
+            "failed": failed,
+        }
+        self.messages[message_id] = message
+        return message
+
+    def _render_message(self, message: dict) -> dict:
+        body = {k: v for k, v in message.items() if k not in ("created", "failed")}
+        elapsed = time.monotonic() - message["created"]
+        if elapsed < self.config.generation_time:
+            body["status"] = "EXECUTING_QUERY"
+        elif message["failed"]:
+            body["status"] = "FAILED"
+        else:
+            body["status"] = "COMPLETED"
+            body["attachments"] = [
+                {
+                    "attachment_id": f"att-{message['message_id']}",
+                    "query": {
+                        "description": f"Answer to: {message['content']}",
+                        "query": "SELECT * FROM stub_table",
+                        "statement_id": f"stmt-{message['message_id']}",
+                        "query_result_metadata": {"row_count": self.config.rows},
+                    },
+                }
+            ]
+        return body
+
+    async def start_conversation(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        conversation_id = uuid.uuid4().hex
+        message = self._new_message(
+            request.match_info["space_id"], conversation_id, body.get("content", "")
+        )
+        return web.json_response(
+            {
+                "conversation_id": conversation_id,
+                "message_id": message["message_id"],
+                "message": self._render_message(message),
+            }
+        )
+
+    async def create_message(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        message = self._new_message(
+            request.match_info["space_id"],
+            request.match_info["conversation_id"],
+            body.get("content", ""),
+        )
+        return web.json_response(self._render_message(message))
+
+    async def get_message(self, request: web.Request) -> web.Response:
+        message = self.messages.get(request.match_info["message_id"])
+        if message is None:
+            return web.json_response({"error_code": "NOT_FOUND"}, status=404)
+        return web.json_response(self._render_message(message))
+
+    async def query_result(self, request: web.Request) -> web.Response:
+        message_id = request.match_info["message_id"]
+        return web.json_response(
+            {"statement_response": self.statement_response(f"stmt-{message_id}")}
+        )
+
+    def schema(self) -> list[dict]:
+        columns = [{"name": "day", "type_name": "DATE", "position": 0}]
+        columns += [
+            {"name": f"measure_{i}", "type_name": "DOUBLE", "position": i}
+            for i in range(1, self.config.columns)
+        ]
+        return columns
+
+    def rows(self, start: int, stop: int) -> list[list[str]]:
+        return [
+            [f"2025-01-{row % 28 + 1:02d}"]
+            + [f"{row * i + 0.5}" for i in range(1, self.config.columns)]
+            for row in range(start, stop)
+        ]
+
+    def statement_response(self, statement_id: str) -> dict:
+        columns = self.schema()
+        return {
+            "statement_id": statement_id,
+            "status": {"state": "SUCCEEDED"},
+            "manifest": {
+                "format": "JSON_ARRAY",
+                "schema": {"column_count": len(columns), "columns": columns},
+                "total_row_count": self.config.rows,
+            },
+            "result": {
+                "data_array": self.rows(0, self.config.rows),
+                "row_count": self.config.rows,
+            },
+        }
+
+    # SQL warehouses: always running, so warm-ups never start one
+    async def warehouse(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {"id": request.match_info["warehouse_id"], "state": "RUNNING"}
+        )
+
+    # SQL statement execution
+    def chunk(self, chunk_index: int) -> dict:
+        start = chunk_index * self.config.chunk_rows
+        stop = min(start + self.config.chunk_rows, self.config.rows)
+        chunk = {
+            "chunk_index": chunk_index,
+            "row_offset": start,
+            "row_count": stop - start,
+            "data_array": self.rows(start, stop),
+        }
+        if stop < self.config.rows:
+            chunk["next_chunk_index"] = chunk_index + 1
+        return chunk
+
+    async def get_statement(self, request: web.Request) -> web.Response:
+        columns = self.schema()
+        chunk_count = max(1, -(-self.config.rows // self.config.chunk_rows))
+        return web.json_response(
+            {
+                "statement_id": request.match_info["statement_id"],
+                "status": {"state": "SUCCEEDED"},
+                "manifest": {
+                    "format": "JSON_ARRAY",
+                    "schema": {"column_count": len(columns), "columns": columns},
+                    "total_row_count": self.config.rows,
+                    "total_chunk_count": chunk_count,
+                },
+                "result": self.chunk(0),
+            }
+        )
+
+    async def get_chunk(self, request: web.Request) -> web.Response:
+        return web.json_response(self.chunk(int(request.match_info["chunk_index"])))
+
+    # Bot Framework connector
+    async def send(self, request: web.Request) -> web.Response:
+        await request.read()
+        return web.json_response({"id": f"activity-{next(self.activity_ids)}"})
+
+    async def update(self, request: web.Request) -> web.Response:
+        await request.read()
+        return web.json_response({"id": request.match_info["activity_id"]})
+
+    # Control
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.calls))
+
+    async def reset(self, request: web.Request) -> web.Response:
+        self.calls.clear()
+        return web.json_response({})
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--generation-time", type=float, default=0.0)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--columns", type=int, default=4)
+    parser.add_argument("--chunk-rows", type=int, default=10_000)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    config = StubConfig(
+        latency=args.latency,
+        generation_time=args.generation_time,
+        rows=args.rows,
+        columns=args.columns,
+        chunk_rows=args.chunk_rows,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    web.run_app(StubServer(config).app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
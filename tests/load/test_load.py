@@ -0,0 +1,33 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parents[2]
+
+
+def run_harness(*args: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-m", "tests.load.harness", "--json", *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_load_harness_smoke() -> None:
+    report = run_harness("--users", "4", "--requests", "2", "--rows", "50")
+
+    assert report["requests"] == 8
+    assert report["errors"] == 0
+    assert report["throughput_rps"] > 0
+    assert report["p50_ms"] <= report["p95_ms"] <= report["p99_ms"]
+    assert report["peak_rss_mb"] > 0
+    # every question ends with the waiting card being replaced by the answer
+    update_activity = "PUT /v3/conversations/{conversation_id}/activities/{activity_id}"
+    assert report["upstream_calls"][update_activity] == 8
+    # the first question switches to the space, which warms up its warehouse once
+    assert report["upstream_calls"]["GET /api/2.0/genie/spaces/{space_id}"] == 1
@@ -1,9 +1,16 @@
+import asyncio
 import logging
-
+from types import SimpleNamespace
 from unittest.mock import create_autospec
 
+from botbuilder.core import ConversationState, MemoryStorage, Storage, UserState
+from botbuilder.core.adapters import TestAdapter
 from databricks.sdk import WorkspaceClient
 
+from chatx.bot import MyBot
+from chatx.const import OAUTH_CONNECTION_NAME
+from chatx.genie_result import GenieResult
+from chatx.login_dialog import LoginDialog
 
 logging.getLogger("tests").setLevel("DEBUG")
 logger = logging.getLogger(__name__)
@@ -15,3 +22,53 @@ def mock_workspace_client():
     """
     ws = create_autospec(WorkspaceClient)
     return ws
+
+
+def make_bot(
+    auth_method: str = "service_principal",
+    storage: Storage | None = None,
+    **kwargs,
+) -> tuple[MyBot, TestAdapter]:
+    """
+    Builds a bot on in-memory state and a test adapter to drive it. The adapter's
+    user is "User1" on the "test" channel.
+    """
+    storage = storage or MemoryStorage()
+    bot = MyBot(
+        ConversationState(storage),
+        UserState(storage),
+        LoginDialog(OAUTH_CONNECTION_NAME),
+        auth_method=auth_method,
+        **kwargs,
+    )
+    return bot, TestAdapter(bot.on_turn)
+
+
+class FakeGenieQuerier:
+    """
+    Stands in for a GenieQuerier: answers every question with a message, with one
+    conversation per space, and records the questions and how many ran at once.
+    """
+
+    auth_method = "service_principal"
+
+    def __init__(self, statement_id: str | None = None):
+        self.statement_id = statement_id
+        self.asked: list[tuple[str, str, str | None]] = []
+        self.running = 0
+        self.max_running = 0
+
+    async def ask_genie(self, question, space_id, conversation_id) -> GenieResult:
+        self.asked.append((question, space_id, conversation_id))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return GenieResult(
+            message=f"answer from {space_id}",
+            conversation_id=space_id,
+            statement_id=self.statement_id,
+        )
+
+    async def get_workspace_client(self):
+        return SimpleNamespace()
@@ -0,0 +1,25 @@
+import asyncio
+
+from chatx.app import InFlightTracker
+
+
+def test_in_flight_tracker_drains() -> None:
+    async def scenario():
+        tracker = InFlightTracker()
+        tracker.start()
+        asyncio.get_running_loop().call_later(0.01, tracker.finish)
+        return await tracker.drain(timeout=1), tracker.draining
+
+    drained, draining = asyncio.run(scenario())
+
+    assert drained
+    assert draining
+
+
+def test_in_flight_tracker_drain_timeout() -> None:
+    async def scenario():
+        tracker = InFlightTracker()
+        tracker.start()
+        return await tracker.drain(timeout=0.01), tracker.count
+
+    assert asyncio.run(scenario()) == (False, 1)
@@ -0,0 +1,48 @@
+import asyncio
+
+
+from chatx.const import OAUTH_CONNECTION_NAME
+from chatx.genie import GenieQuerier
+from chatx.genie_result import GenieResult
+from tests.unit import make_bot
+
+
+def ask_on_fresh_worker(monkeypatch, token: str | None):
+    asked = []
+
+    async def ask_genie(self, question, space_id, conversation_id):
+        asked.append((self.auth_method, question))
+        return GenieResult(message="42 trips", conversation_id="conv-1")
+
+    monkeypatch.setattr(GenieQuerier, "ask_genie", ask_genie)
+
+    async def run():
+        # A worker that has never served this user: it has no querier for them
+        bot, adapter = make_bot(auth_method="oauth")
+        if token is not None:
+            adapter.add_user_token(OAUTH_CONNECTION_NAME, "test", "User1", token)
+        await adapter.receive_activity("How many trips yesterday? @taxi")
+        return bot, adapter
+
+    bot, adapter = asyncio.run(run())
+    return asked, bot, adapter
+
+
+def test_querier_is_rebuilt_from_the_users_token(monkeypatch) -> None:
+    asked, bot, adapter = ask_on_fresh_worker(monkeypatch, token="user-token")
+
+    # The question is answered in the same turn, without a sign-in prompt
+    assert asked == [("oauth", "How many trips yesterday? @taxi")]
+    assert bot.genie_querier["User1"]._token == "user-token"
+    assert [activity.text for activity in adapter.updated_activities] == [
+        "42 trips\n\n"
+    ]
+
+
+def test_sign_in_is_prompted_without_a_token(monkeypatch) -> None:
+    asked, bot, adapter = ask_on_fresh_worker(monkeypatch, token=None)
+
+    assert asked == []
+    assert "User1" not in bot.genie_querier
+    [prompt] = adapter.activity_buffer
+    assert prompt.attachments[0].content_type.endswith("oauth")
@@ -0,0 +1,123 @@
+import math
+from datetime import date, timedelta
+
+from databricks.sdk.service.sql import (
+    ColumnInfo,
+    ColumnInfoTypeName,
+    StatementResponse,
+)
+
+from chatx.chart import (
+    CHART_MAX_CATEGORIES,
+    CHART_MIN_ROWS,
+    CHART_POINT_BUDGET,
+    build_chart,
+    lttb,
+)
+from chatx.columnar import ColumnarResult
+from chatx.genie_result import GenieResult
+
+
+def test_lttb_keeps_endpoints_and_peaks() -> None:
+    xs = [float(i) for i in range(1000)]
+    ys = [math.sin(i / 50) for i in range(1000)]
+    ys[500] = 10.0
+
+    kept = lttb(xs, ys, 100)
+
+    assert len(kept) == 100
+    assert kept[0] == 0 and kept[-1] == 999
+    assert kept == sorted(kept)
+    assert 500 in kept
+    assert lttb(xs[:10], ys[:10], 100) == list(range(10))
+
+
+def test_build_chart_downsamples_time_series() -> None:
+    schema = [
+        ColumnInfo(name="day", type_name=ColumnInfoTypeName.DATE),
+        ColumnInfo(name="revenue", type_name=ColumnInfoTypeName.DOUBLE),
+    ]
+    start = date(2020, 1, 1)
+    # Rows arrive unsorted, with two rows per day that are summed
+    rows = [
+        [(start + timedelta(days=day)).isoformat(), "1.5"]
+        for day in reversed(range(5000))
+        for _ in range(2)
+    ]
+
+    chart = build_chart(ColumnarResult.from_rows(schema, rows))
+
+    assert chart.kind == "line"
+    assert chart.row_count == 10_000
+    assert chart.point_count == CHART_POINT_BUDGET
+    points = chart.series[0].points
+    assert points[0] == ("2020-01-01", 3.0)
+    assert points[-1][0] == (start + timedelta(days=4999)).isoformat()
+
+
+def test_build_chart_keeps_top_categories(monkeypatch) -> None:
+    monkeypatch.setattr("chatx.chart.CHART_MIN_ROWS", 50)
+    schema = [
+        ColumnInfo(name="country", type_name=ColumnInfoTypeName.STRING),
+        ColumnInfo(name="orders", type_name=ColumnInfoTypeName.LONG),
+        ColumnInfo(name="revenue", type_name=ColumnInfoTypeName.DOUBLE),
+    ]
+    rows = [[f"c{i}", str(i), str(i * 2)] for i in range(100)]
+
+    chart = build_chart(ColumnarResult.from_rows(schema, rows))
+
+    assert chart.kind == "bar"
+    orders, revenue = chart.series
+    assert len(orders.points) == CHART_MAX_CATEGORIES
+    assert orders.points[0] == ("c99", 99)
+    assert orders.points[-1] == ("Other", sum(range(91)))
+    assert [x for x, _ in revenue.points] == [x for x, _ in orders.points]
+    assert revenue.points[-1] == ("Other", 2.0 * sum(range(91)))
+
+
+def test_small_or_unchartable_results_stay_tables() -> None:
+    schema = [
+        ColumnInfo(name="name", type_name=ColumnInfoTypeName.STRING),
+        ColumnInfo(name="email", type_name=ColumnInfoTypeName.STRING),
+    ]
+    many = ColumnarResult.from_rows(schema, [["a", "b"]] * 500)
+    assert build_chart(many) is None
+    assert build_chart(ColumnarResult.from_rows(schema[:1], [["a"]] * 5)) is None
+
+    def card_types(rows: int) -> list[str]:
+        table = ColumnarResult.from_rows(
+            [schema[0], ColumnInfo(name="n", type_name=ColumnInfoTypeName.INT)],
+            [[f"k{i % 7}", str(i)] for i in range(rows)],
+        )
+        activity = GenieResult(
+            query="SELECT 1", statement_response=StatementResponse(), table=table
+        ).process_query_results()
+        return [item["type"] for item in activity.attachments[0].content["body"]]
+
+    # Moderate results keep every row
+    assert "Table" in card_types(200)
+    assert "Chart.VerticalBar.Grouped" in card_types(CHART_MIN_ROWS)
+
+
+def test_ids_and_averages_are_not_summed(monkeypatch) -> None:
+    monkeypatch.setattr("chatx.chart.CHART_MIN_ROWS", 50)
+    # A list of customers is not a chart, whatever its size
+    customers = ColumnarResult.from_rows(
+        [
+            ColumnInfo(name="customer_id", type_name=ColumnInfoTypeName.LONG),
+            ColumnInfo(name="name", type_name=ColumnInfoTypeName.STRING),
+            ColumnInfo(name="avg_order_value", type_name=ColumnInfoTypeName.DOUBLE),
+        ],
+        [[str(i), f"customer {i}", "42.5"] for i in range(60)],
+    )
+    assert build_chart(customers) is None
+
+    # Averages are averaged per category and in "Other"
+    schema = [
+        ColumnInfo(name="zone", type_name=ColumnInfoTypeName.STRING),
+        ColumnInfo(name="avg_fare", type_name=ColumnInfoTypeName.DOUBLE),
+    ]
+    rows = [[f"z{i % 20}", str(i % 20)] for i in range(100)]
+    [fares] = build_chart(ColumnarResult.from_rows(schema, rows)).series
+    assert fares.points[0] == ("z19", 19.0)
+    assert fares.points[-1] == ("Other", sum(range(11)) / 11)
@@ -0,0 +1,61 @@
+import json
+
+from databricks.sdk.service.sql import (
+    ColumnInfo,
+    ColumnInfoTypeName,
+    ResultData,
+    ResultManifest,
+    ResultSchema,
+    StatementResponse,
+)
+
+from chatx.columnar import ColumnarResult, DictionaryColumn, NumericColumn
+from chatx.genie_result import GenieResult
+
+SCHEMA = [
+    ColumnInfo(name="id", type_name=ColumnInfoTypeName.LONG),
+    ColumnInfo(name="region", type_name=ColumnInfoTypeName.STRING),
+    ColumnInfo(name="amount", type_name=ColumnInfoTypeName.DECIMAL),
+]
+ROWS = [
+    ["1", "EMEA", "10.5"],
+    ["2", None, "20.25"],
+    ["3", "EMEA", None],
+    ["99999999999999999999", "APAC", "1"],
+]
+
+
+def test_columnar_result() -> None:
+    table = ColumnarResult.from_rows(SCHEMA, ROWS)
+
+    assert len(table) == 4
+    assert table.names == ["id", "region", "amount"]
+    # the LONG column overflows int64, so it falls back to strings
+    assert isinstance(table.column("id"), DictionaryColumn)
+    assert isinstance(table.column("amount"), NumericColumn)
+    assert table.column("amount").values.typecode == "d"
+    assert table.column("region").dictionary == ["EMEA", "APAC"]
+    assert list(table.row(1)) == ["2", None, 20.25]
+    assert table.row(2)[2] is None
+    assert [list(row) for row in table][0] == ["1", "EMEA", 10.5]
+
+
+def test_columnar_result_is_compact() -> None:
+    rows = [[str(i), ["EMEA", "APAC"][i % 2], f"{i}.5"] for i in range(10_000)]
+    table = ColumnarResult.from_rows(SCHEMA, json.loads(json.dumps(rows)))
+
+    assert isinstance(table.column("id"), NumericColumn)
+    assert table.nbytes() < 10_000 * 24
+
+
+def test_genie_result_keeps_columnar_rows_only() -> None:
+    statement_response = StatementResponse(
+        result=ResultData(data_array=ROWS[:3]),
+        manifest=ResultManifest(schema=ResultSchema(columns=SCHEMA)),
+    )
+    result = GenieResult(statement_response=statement_response)
+
+    assert statement_response.result.data_array is None
+    response = json.dumps(result.process_query_results().as_dict())
+    assert "20.25" in response
+    assert "NULL" in response
@@ -0,0 +1,188 @@
+import asyncio
+import csv
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+from botbuilder.schema import Activity, ActivityTypes
+from databricks.sdk.service.sql import (
+    ColumnInfo,
+    ColumnInfoTypeName,
+    ResultData,
+    ResultManifest,
+    ResultSchema,
+    StatementResponse,
+    StatementState,
+    StatementStatus,
+)
+
+from chatx import adaptive_card
+from chatx.adaptive_card import AdaptiveCardFactory
+from chatx.export import ExportError, ExportResult, ResultExporter, find_export
+from tests.unit import FakeGenieQuerier, make_bot
+
+SCHEMA = [
+    ColumnInfo(name="region", type_name=ColumnInfoTypeName.STRING),
+    ColumnInfo(name="amount", type_name=ColumnInfoTypeName.DOUBLE),
+]
+CHUNKS = [
+    ResultData(data_array=[["EMEA", "1.5"], ["APAC", None]], next_chunk_index=1),
+    ResultData(data_array=[["AMER", "3"]], next_chunk_index=2),
+    ResultData(data_array=[["LATAM", "4"]]),
+]
+
+
+class FakeStatementExecution:
+    def __init__(
+        self,
+        state: StatementState = StatementState.SUCCEEDED,
+        total_row_count: int = 4,
+        truncated: bool = False,
+    ):
+        self.state = state
+        self.total_row_count = total_row_count
+        self.truncated = truncated
+        self.fetched_chunks = []
+
+    def get_statement(self, statement_id: str) -> StatementResponse:
+        return StatementResponse(
+            statement_id=statement_id,
+            status=StatementStatus(state=self.state),
+            manifest=ResultManifest(
+                schema=ResultSchema(columns=SCHEMA),
+                total_chunk_count=len(CHUNKS),
+                total_row_count=self.total_row_count,
+                truncated=self.truncated,
+            ),
+            result=CHUNKS[0],
+        )
+
+    def get_statement_result_chunk_n(self, statement_id: str, chunk_index: int):
+        self.fetched_chunks.append(chunk_index)
+        return CHUNKS[chunk_index]
+
+
+def test_export_csv_streams_every_chunk(tmp_path) -> None:
+    statement_execution = FakeStatementExecution()
+    workspace_client = SimpleNamespace(statement_execution=statement_execution)
+    exporter = ResultExporter(str(tmp_path), "https://bot.example.com/", 60)
+
+    export = asyncio.run(exporter.export(workspace_client, "stmt-1", "csv"))
+
+    assert statement_execution.fetched_chunks == [1, 2]
+    assert export.row_count == 4
+    assert not export.truncated
+    assert export.url == f"https://bot.example.com/api/exports/{export.path.name}"
+    with open(export.path, newline="") as f:
+        assert list(csv.reader(f)) == [
+            ["region", "amount"],
+            ["EMEA", "1.5"],
+            ["APAC", ""],
+            ["AMER", "3"],
+            ["LATAM", "4"],
+        ]
+    assert find_export(str(tmp_path), export.path.name, 60) == export.path
+
+
+@pytest.mark.parametrize(
+    "statement_execution",
+    [
+        FakeStatementExecution(truncated=True),
+        FakeStatementExecution(total_row_count=10_000),
+    ],
+)
+def test_export_of_truncated_result_is_partial(statement_execution, tmp_path) -> None:
+    workspace_client = SimpleNamespace(statement_execution=statement_execution)
+    exporter = ResultExporter(str(tmp_path), "https://bot.example.com", 60)
+
+    export = asyncio.run(exporter.export(workspace_client, "stmt-1", "csv"))
+    card = AdaptiveCardFactory.get_export_card(
+        export.file_name, export.url, export.row_count, 100, export.truncated
+    )
+
+    assert export.row_count == 4 and export.truncated
+    body = card.attachments[0].content["body"]
+    assert body[0]["text"] == "Partial export ready"
+    assert "truncated" in body[-1]["text"]
+
+
+def test_export_parquet(tmp_path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    workspace_client = SimpleNamespace(statement_execution=FakeStatementExecution())
+    exporter = ResultExporter(str(tmp_path), "https://bot.example.com", 60)
+
+    export = asyncio.run(exporter.export(workspace_client, "stmt-1", "parquet"))
+
+    table = pq.read_table(export.path)
+    assert table.column("amount").to_pylist() == [1.5, None, 3.0, 4.0]
+
+
+def test_export_expired_statement(tmp_path) -> None:
+    statement_execution = FakeStatementExecution(StatementState.CLOSED)
+    workspace_client = SimpleNamespace(statement_execution=statement_execution)
+    exporter = ResultExporter(str(tmp_path), "https://bot.example.com", 60)
+
+    with pytest.raises(ExportError):
+        asyncio.run(exporter.export(workspace_client, "stmt-1", "csv"))
+
+
+def test_find_export(tmp_path) -> None:
+    name = "a" * 43 + ".csv"
+    path = tmp_path / name
+    path.write_text("x")
+
+    assert find_export(str(tmp_path), "../secrets.csv", 60) is None
+    assert find_export(str(tmp_path), name, 60) == path
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    assert find_export(str(tmp_path), name, 60) is None
+    assert not path.exists()
+
+
+def test_only_statements_sent_to_the_user_are_exported(monkeypatch, tmp_path) -> None:
+    exported = []
+
+    async def export(self, workspace_client, statement_id, export_format):
+        exported.append(statement_id)
+        path = tmp_path / "export.csv"
+        return ExportResult(
+            path=path,
+            url="https://bot.example.com",
+            row_count=1,
+            byte_count=1,
+            seconds=0.1,
+        )
+
+    monkeypatch.setattr(ResultExporter, "export", export)
+
+    def export_action(statement_id: str) -> Activity:
+        return Activity(
+            type=ActivityTypes.message,
+            value={"action": "export", "statement_id": statement_id, "format": "csv"},
+        )
+
+    async def run():
+        bot, adapter = make_bot()
+        bot.genie_querier["User1"] = FakeGenieQuerier(statement_id="stmt-1")
+        # A forged action for a statement the user was never sent
+        await adapter.receive_activity(export_action("stmt-other"))
+        await adapter.receive_activity("How many trips yesterday? @taxi")
+        await adapter.receive_activity(export_action("stmt-1"))
+        return adapter
+
+    adapter = asyncio.run(run())
+
+    assert exported == ["stmt-1"]
+    assert "can no longer be exported" in adapter.activity_buffer[0].text
+
+
+def test_parquet_action_needs_pyarrow(monkeypatch) -> None:
+    def export_titles() -> list[str]:
+        actions = AdaptiveCardFactory.get_result_actions("SELECT 1", "stmt-1")
+        return [action["title"] for action in actions[1:]]
+
+    monkeypatch.setattr(adaptive_card, "PARQUET_AVAILABLE", False)
+    assert export_titles() == ["Export CSV"]
+    monkeypatch.setattr(adaptive_card, "PARQUET_AVAILABLE", True)
+    assert export_titles() == ["Export CSV", "Export Parquet"]
@@ -0,0 +1,47 @@
+import asyncio
+
+from chatx.bot import get_space_id, get_space_ids
+from chatx.const import SPACE_NOT_FOUND, SPACES
+from tests.unit import FakeGenieQuerier, make_bot
+
+BAKEHOUSE = SPACES["bakehouse"]
+TAXI = SPACES["taxi"]
+
+
+def test_get_space_ids() -> None:
+    assert get_space_ids("compare @taxi and @Bakehouse") == [TAXI, BAKEHOUSE]
+    assert get_space_ids("@taxis only") == []
+    assert get_space_ids("no mention") == []
+    # A single mention is matched the same way
+    assert get_space_id("@taxis only") == SPACE_NOT_FOUND
+    assert get_space_id("trips by zone @Taxi") == TAXI
+
+
+def test_fan_out_asks_each_space_under_the_cap() -> None:
+    async def run():
+        bot, adapter = make_bot()
+        bot.fan_out_limit = asyncio.Semaphore(1)
+        genie_querier = bot.genie_querier["User1"] = FakeGenieQuerier()
+
+        await adapter.receive_activity("revenue @bakehouse vs @taxi")
+        await adapter.receive_activity("and last year? @bakehouse @taxi")
+        return adapter, genie_querier
+
+    adapter, genie_querier = asyncio.run(run())
+
+    # Each space has its own conversation, continued by the second question
+    assert [asked[1:] for asked in genie_querier.asked] == [
+        (BAKEHOUSE, None),
+        (TAXI, None),
+        (BAKEHOUSE, BAKEHOUSE),
+        (TAXI, TAXI),
+    ]
+    assert genie_querier.max_running == 1
+    answers = [activity.text for activity in adapter.updated_activities]
+    assert answers[:2] == [
+        f"**@bakehouse**\n\nanswer from {BAKEHOUSE}\n\n",
+        f"**@taxi**\n\nanswer from {TAXI}\n\n",
+    ]
+    # Answers replace the waiting cards, which were sent in order of mention
+    waiting_ids = [activity.id for activity in adapter.updated_activities[:2]]
+    assert waiting_ids == sorted(waiting_ids)
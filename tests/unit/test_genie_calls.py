@@ -0,0 +1,64 @@
+import asyncio
+
+from aiohttp import web
+
+from chatx import genie
+from chatx.genie import GenieQuerier
+from tests.load.stub_server import StubConfig, StubServer
+
+GENIE = "/api/2.0/genie/spaces/{space_id}"
+MESSAGE = GENIE + "/conversations/{conversation_id}/messages/{message_id}"
+
+
+def ask(monkeypatch, config: StubConfig, questions: int) -> tuple[list, dict]:
+    stub = StubServer(config)
+
+    async def run():
+        runner = web.AppRunner(stub.app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(genie, "DATABRICKS_HOST", f"http://127.0.0.1:{port}")
+        try:
+            querier = GenieQuerier(token="stub-token")
+            results, conversation_id = [], None
+            for _ in range(questions):
+                result = await querier.ask_genie(
+                    "Trips by day", "space", conversation_id
+                )
+                conversation_id = result.conversation_id
+                results.append(result)
+            return results
+        finally:
+            await runner.cleanup()
+
+    results = asyncio.run(run())
+    genie_calls = {
+        route: count for route, count in stub.calls.items() if "/genie/" in route
+    }
+    return results, genie_calls
+
+
+def test_completed_question_costs_two_calls(monkeypatch) -> None:
+    results, calls = ask(monkeypatch, StubConfig(rows=5), questions=2)
+
+    # The question, then its query result: no message polls or re-reads
+    assert [result.api_calls for result in results] == [2, 2]
+    assert all(result.table is not None for result in results)
+    assert calls == {
+        f"POST {GENIE}/start-conversation": 1,
+        f"POST {GENIE}/conversations/{{conversation_id}}/messages": 1,
+        f"GET {MESSAGE}/query-result/{{attachment_id}}": 2,
+    }
+
+
+def test_calls_include_polls_until_completed(monkeypatch) -> None:
+    [result], calls = ask(
+        monkeypatch, StubConfig(rows=5, generation_time=0.5), questions=1
+    )
+
+    polls = calls[f"GET {MESSAGE}"]
+    assert polls >= 1
+    assert result.api_calls == sum(calls.values()) == polls + 2
+    assert result.table is not None
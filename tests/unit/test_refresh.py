@@ -0,0 +1,185 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from botbuilder.schema import Activity, ActivityTypes
+from databricks.sdk.service.dashboards import (
+    GenieAttachment,
+    GenieMessage,
+    GenieQueryAttachment,
+    GenieSpace,
+)
+from databricks.sdk.service.sql import (
+    ColumnInfo,
+    ColumnInfoTypeName,
+    ResultData,
+    ResultManifest,
+    ResultSchema,
+    ServiceError,
+    StatementResponse,
+    StatementState,
+    StatementStatus,
+)
+
+from chatx.genie import GenieQuerier, RefreshError
+from tests.unit import make_bot
+
+QUERY = "SELECT region, SUM(amount) FROM sales GROUP BY region"
+
+
+def statement(state: StatementState, error: str | None = None) -> StatementResponse:
+    return StatementResponse(
+        statement_id="stmt-2",
+        status=StatementStatus(
+            state=state, error=ServiceError(message=error) if error else None
+        ),
+        manifest=ResultManifest(
+            schema=ResultSchema(
+                columns=[
+                    ColumnInfo(name="region", type_name=ColumnInfoTypeName.STRING),
+                    ColumnInfo(name="amount", type_name=ColumnInfoTypeName.DOUBLE),
+                ]
+            )
+        ),
+        result=ResultData(data_array=[["EMEA", "42"]]),
+    )
+
+
+class FakeStatementExecution:
+    def __init__(self, responses: list[StatementResponse]):
+        self.responses = responses
+        self.executed = []
+        self.wait_timeouts = []
+
+    def execute_statement(self, statement: str, warehouse_id: str, **kwargs):
+        self.executed.append((statement, warehouse_id))
+        self.wait_timeouts.append(kwargs["wait_timeout"])
+        return self.responses.pop(0)
+
+    def get_statement(self, statement_id: str):
+        return self.responses.pop(0)
+
+
+def querier_for(statement_execution: FakeStatementExecution) -> GenieQuerier:
+    message = SimpleNamespace(
+        attachments=[
+            SimpleNamespace(
+                attachment_id="att-1",
+                query=SimpleNamespace(query=QUERY, description="Sales by region"),
+            )
+        ]
+    )
+    genie_querier = GenieQuerier(token="token")
+    genie_querier._workspace_client = SimpleNamespace(
+        genie=SimpleNamespace(get_message=lambda *args: message),
+        statement_execution=statement_execution,
+    )
+    return genie_querier
+
+
+def test_refresh_query_reruns_genie_sql(monkeypatch) -> None:
+    monkeypatch.setattr("chatx.genie.REFRESH_POLL_SECONDS", 0.05)
+    statement_execution = FakeStatementExecution(
+        [statement(StatementState.PENDING), statement(StatementState.SUCCEEDED)]
+    )
+
+    async def run():
+        ticks = 0
+
+        async def count_ticks():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(count_ticks())
+        try:
+            result = await querier_for(statement_execution).refresh_query(
+                "space-1", "conv-1", "msg-1", "att-1", "wh-1"
+            )
+        finally:
+            ticker.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(run())
+
+    # The loop keeps running while the statement is polled
+    assert ticks >= 3
+    assert statement_execution.wait_timeouts == ["5s"]
+    assert statement_execution.executed == [(QUERY, "wh-1")]
+    assert result.statement_id == "stmt-2"
+    assert result.query_description.startswith("Sales by region")
+    assert [list(row) for row in result.table] == [["EMEA", 42.0]]
+    # The refreshed card can be refreshed again
+    response = json.dumps(result.process_query_results().as_dict())
+    assert '"action": "refresh"' in response and '"attachment_id": "att-1"' in response
+
+
+def test_refresh_query_errors() -> None:
+    statement_execution = FakeStatementExecution(
+        [statement(StatementState.FAILED, "Table not found")]
+    )
+    genie_querier = querier_for(statement_execution)
+
+    with pytest.raises(RefreshError, match="Table not found"):
+        asyncio.run(
+            genie_querier.refresh_query("space-1", "conv-1", "msg-1", "att-1", "wh-1")
+        )
+    with pytest.raises(RefreshError, match="no query"):
+        asyncio.run(
+            genie_querier.refresh_query("space-1", "conv-1", "msg-1", "att-9", "wh-1")
+        )
+
+
+def test_refresh_action_resolves_warehouse_from_genie_space(monkeypatch) -> None:
+    monkeypatch.setattr("chatx.genie.REFRESH_POLL_SECONDS", 0)
+    statement_execution = FakeStatementExecution([statement(StatementState.SUCCEEDED)])
+    # Real SDK objects, as parsed from the Genie API responses
+    space = GenieSpace.from_dict(
+        {"space_id": "space-1", "title": "Sales", "warehouse_id": "wh-1"}
+    )
+    message = GenieMessage(
+        id="msg-1",
+        message_id="msg-1",
+        space_id="space-1",
+        conversation_id="conv-1",
+        content="Sales by region",
+        attachments=[
+            GenieAttachment(
+                attachment_id="att-1",
+                query=GenieQueryAttachment(query=QUERY, description="Sales by region"),
+            )
+        ],
+    )
+    genie_querier = GenieQuerier(token="token")
+    genie_querier._workspace_client = SimpleNamespace(
+        genie=SimpleNamespace(
+            get_space=lambda space_id: space,
+            get_message=lambda *args: message,
+        ),
+        statement_execution=statement_execution,
+    )
+
+    async def run():
+        bot, adapter = make_bot()
+        bot.genie_querier["User1"] = genie_querier
+        await adapter.receive_activity(
+            Activity(
+                type=ActivityTypes.message,
+                value={
+                    "action": "refresh",
+                    "space_id": "space-1",
+                    "conversation_id": "conv-1",
+                    "message_id": "msg-1",
+                    "attachment_id": "att-1",
+                },
+            )
+        )
+        return adapter
+
+    adapter = asyncio.run(run())
+
+    assert statement_execution.executed == [(QUERY, "wh-1")]
+    [refreshed] = adapter.updated_activities
+    assert refreshed.attachments[0].content_type.startswith("application/vnd")
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+from databricks.sdk.service.sql import (
+    ColumnInfo,
+    ColumnInfoTypeName,
+    StatementResponse,
+)
+
+from chatx.columnar import ColumnarResult
+from chatx.genie_result import GenieResult
+from chatx.loop_monitor import LoopLagMonitor
+from chatx.rendering import ResultRenderer
+
+
+def table_result(rows: int) -> GenieResult:
+    schema = [
+        ColumnInfo(name="zone", type_name=ColumnInfoTypeName.STRING),
+        ColumnInfo(name="trips", type_name=ColumnInfoTypeName.LONG),
+    ]
+    table = ColumnarResult.from_rows(
+        schema, [[f"zone {i}", str(i)] for i in range(rows)]
+    )
+    return GenieResult(
+        query="SELECT zone, trips FROM trips",
+        statement_response=StatementResponse(),
+        table=table,
+    )
+
+
+def test_large_results_are_rendered_in_the_pool() -> None:
+    renderer = ResultRenderer(inline_cells=10, max_processes=1)
+    small, large = table_result(5), table_result(20)
+
+    async def run():
+        try:
+            return await renderer.render(small), await renderer.render(large, "Trips")
+        finally:
+            renderer.shutdown()
+
+    assert not renderer.is_large(small) and renderer.is_large(large)
+    small_activity, large_activity = asyncio.run(run())
+
+    assert small_activity.attachments[0].content == (
+        small.process_query_results().attachments[0].content
+    )
+    assert large_activity.attachments[0].content == (
+        large.process_query_results("Trips").attachments[0].content
+    )
+
+
+def test_start_starts_every_process() -> None:
+    renderer = ResultRenderer(inline_cells=10, max_processes=2)
+
+    async def run():
+        try:
+            await renderer.start()
+            return len(renderer.pool._processes)
+        finally:
+            renderer.shutdown()
+
+    assert asyncio.run(run()) == 2
+
+
+def test_loop_monitor_names_the_stalling_handler() -> None:
+    def format_everything():
+        time.sleep(0.3)
+
+    async def handle_turn():
+        format_everything()
+
+    async def run():
+        monitor = LoopLagMonitor(asyncio.get_running_loop(), threshold=0.05)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.1)
+            await asyncio.create_task(handle_turn(), name="turn")
+            await asyncio.sleep(0.1)
+        finally:
+            monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(run())
+
+    [stall] = monitor.stalls
+    assert stall.seconds >= 0.25
+    assert stall.handler.startswith("turn: ")
+    assert "format_everything" in stall.handler
+    assert monitor.summary()["stalls"] == 1
@@ -0,0 +1,134 @@
+from databricks.sdk.service.sql import (
+    ColumnInfo,
+    ColumnInfoTypeName,
+    ResultManifest,
+    StatementResponse,
+)
+
+from chatx.columnar import ColumnarResult
+from chatx.genie_result import GenieResult
+from chatx.reshape import LastResultCache, Reshape, apply_reshape, find_column
+
+SCHEMA = [
+    ColumnInfo(name="region", type_name=ColumnInfoTypeName.STRING),
+    ColumnInfo(name="product_name", type_name=ColumnInfoTypeName.STRING),
+    ColumnInfo(name="total_revenue", type_name=ColumnInfoTypeName.DOUBLE),
+]
+ROWS = [
+    ["EMEA", "a", "10"],
+    ["APAC", "b", "30"],
+    ["EMEA", "c", None],
+    ["AMER", "d", "20"],
+    ["EMEA", "e", "40"],
+]
+
+
+def reshaped_rows(question: str) -> list[list]:
+    table = ColumnarResult.from_rows(SCHEMA, ROWS)
+    result, _ = apply_reshape(table, Reshape.parse(question))
+    return [list(row) for row in result]
+
+
+def test_parse_follow_ups() -> None:
+    assert Reshape.parse("Sort that by revenue") == Reshape(sort_column="revenue")
+    assert Reshape.parse("order by region ascending.") == Reshape(
+        sort_column="region", descending=False
+    )
+    assert Reshape.parse("top 5") == Reshape(limit=5)
+    assert Reshape.parse("show me the bottom 2 by revenue") == Reshape(
+        sort_column="revenue", descending=False, limit=2
+    )
+    assert Reshape.parse("only show EMEA") == Reshape(filter_value="emea")
+    assert Reshape.parse("What was revenue last quarter?") is None
+
+
+def test_apply_reshape() -> None:
+    assert [row[1] for row in reshaped_rows("sort by revenue")] == list("ebdac")
+    assert [row[1] for row in reshaped_rows("sort by product name desc")] == list(
+        "edcba"
+    )
+    assert reshaped_rows("only show emea") == [
+        ["EMEA", "a", 10.0],
+        ["EMEA", "c", None],
+        ["EMEA", "e", 40.0],
+    ]
+    assert [row[1] for row in reshaped_rows("top 2 by total revenue")] == ["e", "b"]
+    assert [row[1] for row in reshaped_rows("last 2")] == ["d", "e"]
+
+    table = ColumnarResult.from_rows(SCHEMA, ROWS)
+    assert apply_reshape(table, Reshape(sort_column="margin")) is None
+    assert apply_reshape(table, Reshape(filter_value="LATAM")) is None
+
+
+def test_last_result_cache() -> None:
+    cache = LastResultCache(max_bytes=1_000_000)
+    result = GenieResult(
+        query="SELECT ...",
+        statement_id="stmt-1",
+        statement_response=StatementResponse(),
+        conversation_id="conv-1",
+        table=ColumnarResult.from_rows(SCHEMA, ROWS),
+    )
+    cache.put("user-1", "conv-1", result)
+
+    assert cache.reshape("user-1", "conv-2", "top 2") is None
+    assert cache.reshape("user-1", "conv-1", "why did revenue drop?") is None
+
+    sorted_result = cache.reshape("user-1", "conv-1", "sort by revenue")
+    assert sorted_result.statement_id is None
+    assert sorted_result.query == "SELECT ..."
+    # Follow-ups compose on the last local result
+    top = cache.reshape("user-1", "conv-1", "top 2")
+    assert [row[1] for row in top.table] == ["e", "b"]
+    assert "First 2 rows" in top.query_description
+
+    cache.max_bytes = cache.nbytes
+    cache.put("user-2", "conv-9", top)
+    assert list(cache.results) == ["user-2"]
+
+
+def test_find_column_matches_whole_words() -> None:
+    schema = [
+        ColumnInfo(name="id", type_name=ColumnInfoTypeName.LONG),
+        ColumnInfo(name="ride_count", type_name=ColumnInfoTypeName.LONG),
+        ColumnInfo(name="paid_amount", type_name=ColumnInfoTypeName.DOUBLE),
+        ColumnInfo(name="refund_amount", type_name=ColumnInfoTypeName.DOUBLE),
+    ]
+    table = ColumnarResult.from_rows(schema, [["1", "2", "3.0", "0.0"]])
+
+    assert find_column(table, "rides count") is None
+    assert find_column(table, "ride count") == 1
+    assert find_column(table, "paid") == 2
+    assert find_column(table, "ride id") is None
+    # Ambiguous: left to Genie
+    assert find_column(table, "amount") is None
+
+
+def test_names_with_extra_words_go_to_genie() -> None:
+    schema = [
+        ColumnInfo(name="region", type_name=ColumnInfoTypeName.STRING),
+        ColumnInfo(name="revenue", type_name=ColumnInfoTypeName.DOUBLE),
+    ]
+    table = ColumnarResult.from_rows(schema, [["EMEA", "10"], ["APAC", "30"]])
+
+    for question in (
+        "sort by revenue growth",
+        "top 2 by revenue per order",
+        "sort by revenue in 2023 desc",
+    ):
+        assert apply_reshape(table, Reshape.parse(question)) is None, question
+    assert apply_reshape(table, Reshape.parse("sort by revenue desc")) is not None
+
+
+def test_truncated_results_go_to_genie() -> None:
+    cache = LastResultCache(max_bytes=1_000_000)
+    for user_id, manifest in [
+        ("user-1", ResultManifest(truncated=True)),
+        ("user-2", ResultManifest(total_row_count=5_000)),
+    ]:
+        result = GenieResult(
+            statement_response=StatementResponse(manifest=manifest),
+            table=ColumnarResult.from_rows(SCHEMA, ROWS),
+        )
+        cache.put(user_id, "conv-1", result)
+        assert cache.reshape(user_id, "conv-1", "top 2") is None
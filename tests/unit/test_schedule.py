@@ -0,0 +1,48 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from chatx.schedule import WeeklySchedule
+
+
+def test_schedule_next_run() -> None:
+    schedule = WeeklySchedule.parse("mon-fri 08:30,13:00; sat 10:00", "UTC")
+
+    def next_run(text: str) -> str:
+        now = datetime.fromisoformat(text).replace(tzinfo=schedule.timezone)
+        return schedule.next_run(now).strftime("%a %H:%M")
+
+    assert next_run("2025-06-02T07:00") == "Mon 08:30"
+    assert next_run("2025-06-02T08:30") == "Mon 13:00"
+    assert next_run("2025-06-06T14:00") == "Sat 10:00"
+    assert next_run("2025-06-07T11:00") == "Mon 08:30"
+    with pytest.raises(ValueError):
+        WeeklySchedule.parse("weekdays 8am")
+
+
+def test_schedule_is_due() -> None:
+    schedule = WeeklySchedule.parse("sat 10:00", "UTC")
+
+    assert schedule.is_due(datetime(2025, 6, 7, 10, 0, 59, tzinfo=UTC))
+    assert not schedule.is_due(datetime(2025, 6, 7, 10, 1, tzinfo=UTC))
+    assert not schedule.is_due(datetime(2025, 6, 8, 10, 0, tzinfo=UTC))
+
+
+@pytest.mark.parametrize(
+    ("day", "clock", "due_at"),
+    [
+        # Clocks go back at 02:00: 01:30 happens twice, and runs once
+        ("2025-11-02", "01:30", ["2025-11-02T05:30"]),
+        # Clocks go forward at 02:00: 02:30 never happens, and runs an hour later
+        ("2025-03-09", "02:30", ["2025-03-09T07:30"]),
+        ("2025-03-09", "08:30", ["2025-03-09T12:30"]),
+    ],
+)
+def test_schedule_runs_once_a_day_across_dst(day, clock, due_at) -> None:
+    schedule = WeeklySchedule.parse(f"mon-sun {clock}", "America/New_York")
+    start = datetime.fromisoformat(day).replace(tzinfo=UTC)
+
+    ticks = (start + timedelta(minutes=minute) for minute in range(24 * 60))
+    due = [tick.strftime("%Y-%m-%dT%H:%M") for tick in ticks if schedule.is_due(tick)]
+
+    assert due == due_at
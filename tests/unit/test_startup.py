@@ -0,0 +1,69 @@
+import asyncio
+import subprocess
+import sys
+
+import aiohttp
+from aiohttp import web
+
+from chatx.app import HEAVY_MODULES, create_app
+
+# Cumulative import time budget for chatx.app, in microseconds
+IMPORT_BUDGET_US = 1_000_000
+
+
+def import_times(module: str) -> dict[str, int]:
+    """
+    Imports a module in a fresh interpreter with ``-X importtime`` and returns the
+    cumulative import time of every module it loaded, in microseconds.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_app_import_is_light() -> None:
+    times = import_times("chatx.app")
+
+    for module in HEAVY_MODULES:
+        assert module not in times, f"{module} imported by chatx.app"
+    assert times["chatx.app"] < IMPORT_BUDGET_US
+
+
+def test_ready_after_warm_up() -> None:
+    async def scenario():
+        runner = web.AppRunner(await create_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        statuses = []
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"http://127.0.0.1:{port}/health") as response:
+                    statuses.append(response.status)
+                for _ in range(300):
+                    async with session.get(
+                        f"http://127.0.0.1:{port}/ready"
+                    ) as response:
+                        statuses.append(response.status)
+                        if response.status == 200:
+                            break
+                    await asyncio.sleep(0.05)
+        finally:
+            await runner.cleanup()
+        return statuses
+
+    statuses = asyncio.run(scenario())
+
+    assert statuses[0] == 200
+    assert statuses[-1] == 200
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from botbuilder.core import MemoryStorage
+from botbuilder.dialogs import DialogInstance, DialogState
+
+from chatx import storage
+from chatx.storage import SqliteStorage, create_storage, is_network_path
+
+
+def test_sqlite_storage_is_shared_between_instances(tmp_path) -> None:
+    path = str(tmp_path / "state.db")
+    worker_1 = SqliteStorage(path)
+    worker_2 = SqliteStorage(path)
+    dialog_state = DialogState([DialogInstance(id="WFDialog", state={"step": 1})])
+
+    async def scenario():
+        await worker_1.write(
+            {"user": {"SpaceId": "space-1", "ConversationId": "conversation-1"}}
+        )
+        await worker_1.write({"conversation": {"DialogState": dialog_state}})
+        read = await worker_2.read(["user", "conversation", "missing"])
+        await worker_2.delete(["user"])
+        return read, await worker_1.read(["user"])
+
+    read, deleted = asyncio.run(scenario())
+
+    assert read["user"] == {"SpaceId": "space-1", "ConversationId": "conversation-1"}
+    assert read["conversation"]["DialogState"].dialog_stack[0].id == "WFDialog"
+    assert read["conversation"]["DialogState"].dialog_stack[0].state == {"step": 1}
+    assert "missing" not in read
+    assert deleted == {}
+
+
+def test_sqlite_storage_etag_conflict(tmp_path) -> None:
+    storage = SqliteStorage(str(tmp_path / "state.db"))
+
+    async def scenario():
+        await storage.write({"key": {"value": 1, "e_tag": "*"}})
+        await storage.write({"key": {"value": 2, "e_tag": "*"}})
+        await storage.write({"key": {"value": 3, "e_tag": "stale"}})
+
+    with pytest.raises(KeyError):
+        asyncio.run(scenario())
+
+
+def test_create_storage(monkeypatch, tmp_path) -> None:
+    assert isinstance(create_storage("memory"), MemoryStorage)
+    assert isinstance(create_storage(f"sqlite:///{tmp_path}/state.db"), SqliteStorage)
+    monkeypatch.setattr(storage, "DEFAULT_SQLITE_PATH", str(tmp_path / "default.db"))
+    assert create_storage("sqlite").path == str(tmp_path / "default.db")
+    with pytest.raises(ValueError):
+        create_storage("redis://localhost")
+
+
+def test_network_paths_are_found_from_the_mounts(tmp_path) -> None:
+    mounts = tmp_path / "mounts"
+    mounts.write_text(
+        "/dev/sda1 / ext4 rw 0 0\n"
+        "//account.file.core.windows.net/share /home cifs rw 0 0\n"
+        "tmpfs /home/tmp tmpfs rw 0 0\n"
+    )
+
+    assert is_network_path("/home/data/bot_state.db", str(mounts))
+    assert not is_network_path("/home/tmp/bot_state.db", str(mounts))
+    assert not is_network_path("/tmp/bot_state.db", str(mounts))
+    assert not is_network_path("/tmp/bot_state.db", str(tmp_path / "missing"))
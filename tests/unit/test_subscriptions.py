@@ -0,0 +1,166 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+
+from botbuilder.core import MemoryStorage
+
+from chatx.const import SPACES
+from chatx.subscriptions import (
+    SubscriptionScheduler,
+    SubscriptionStore,
+    is_subscription_command,
+)
+from tests.unit import FakeGenieQuerier, make_bot
+
+TAXI = SPACES["taxi"]
+# A Monday
+TICK = datetime(2025, 6, 2, 8, 30, tzinfo=UTC)
+
+
+def test_subscription_commands() -> None:
+    async def run():
+        storage = MemoryStorage()
+        store = SubscriptionStore(storage)
+        _, adapter = make_bot(storage=storage, subscription_store=store)
+        await adapter.receive_activity("subscribe mon-fri 8:30 Yesterday's trips @taxi")
+        await adapter.receive_activity("subscribe 25:00 trips @taxi")
+        subscriptions = await store.list("User1")
+        await adapter.receive_activity("subscriptions")
+        await adapter.receive_activity("unsubscribe all")
+        return adapter, subscriptions, await store.list()
+
+    adapter, subscriptions, remaining = asyncio.run(run())
+
+    [subscription] = subscriptions
+    assert (subscription.days, subscription.time) == ("mon-fri", "08:30")
+    assert subscription.question == "Yesterday's trips @taxi"
+    assert subscription.space_id == TAXI
+    assert subscription.auth_scope == "service_principal"
+    replies = [activity.text for activity in adapter.activity_buffer]
+    assert replies[0].startswith(f"Subscribed (`{subscription.id}`)")
+    assert replies[1].startswith("To subscribe")
+    assert subscription.id in replies[2]
+    assert replies[3] == "Removed 1 subscription(s)."
+    assert remaining == []
+
+
+def test_only_exact_commands_are_subscription_commands() -> None:
+    assert is_subscription_command("subscriptions")
+    assert is_subscription_command("subscribe mon-fri 8:30 Yesterday's trips @taxi")
+    assert is_subscription_command("subscribe 25:00 trips")  # answered with usage
+    assert is_subscription_command("unsubscribe 1a2b3c4d")
+    assert is_subscription_command("Unsubscribe all")
+    assert not is_subscription_command("subscriptions by plan last month @sales")
+    assert not is_subscription_command("subscribe rate by region")
+    assert not is_subscription_command("unsubscribe reasons this quarter")
+
+
+class FakeAdapter:
+    def __init__(self):
+        self.sent = []
+
+    async def continue_conversation(self, reference, callback, bot_id=None):
+        async def send_activity(activity):
+            self.sent.append((reference.user.id, activity.text))
+
+        await callback(SimpleNamespace(send_activity=send_activity))
+
+
+def subscription(user_id: str, question: str, time: str) -> dict:
+    return dict(
+        id=f"{user_id}-{time}",
+        user_id=user_id,
+        question=question,
+        space_id=TAXI,
+        days="mon-fri",
+        time=time,
+        auth_scope="service_principal",
+        reference={"user": {"id": user_id}, "conversation": {"id": user_id}},
+    )
+
+
+def test_scheduler_asks_each_group_once() -> None:
+    genie_querier = FakeGenieQuerier()
+
+    async def run():
+        storage = MemoryStorage()
+        await storage.write(
+            {
+                "chatx/subscriptions": {
+                    "subscriptions": [
+                        subscription("alice", "Yesterday's trips", "08:30"),
+                        subscription("bob", "yesterday's  TRIPS", "08:30"),
+                        subscription("carol", "Fares by zone", "08:30"),
+                        subscription("dave", "Yesterday's trips", "09:00"),
+                    ],
+                    "e_tag": "0",
+                }
+            }
+        )
+        adapter = FakeAdapter()
+        schedulers = [
+            SubscriptionScheduler(
+                SubscriptionStore(storage),
+                adapter,
+                "",
+                "UTC",
+                sends_per_second=1000,
+                concurrency=2,
+                genie_querier_factory=lambda: genie_querier,
+            )
+            for _ in range(2)
+        ]
+        # Two workers run the same tick; only one of them asks and sends
+        await asyncio.gather(*(scheduler.run_tick(TICK) for scheduler in schedulers))
+        return adapter
+
+    adapter = asyncio.run(run())
+
+    assert sorted(asked[:2] for asked in genie_querier.asked) == [
+        ("Fares by zone", TAXI),
+        ("Yesterday's trips", TAXI),
+    ]
+    assert sorted(user for user, _ in adapter.sent) == ["alice", "bob", "carol"]
+    assert all(text.startswith("**Subscription: ") for _, text in adapter.sent)
+
+
+def test_slow_ticks_do_not_skip_minutes(monkeypatch) -> None:
+    class FastClock(datetime):
+        calls = 0
+
+        @classmethod
+        def now(cls, tz=None):
+            # Every look at the clock is 70s later: ticks are always due
+            cls.calls += 1
+            return datetime(2025, 6, 2, 8, 30, 15, tzinfo=tz) + timedelta(
+                seconds=70 * cls.calls
+            )
+
+    class SlowScheduler(SubscriptionScheduler):
+        def __init__(self, *args):
+            super().__init__(*args)
+            self.ticks = []
+
+        async def run_tick(self, tick):
+            self.ticks.append(tick)
+            await asyncio.sleep(3600)  # outlasts the following minutes
+
+    monkeypatch.setattr("chatx.subscriptions.datetime", FastClock)
+
+    async def run():
+        scheduler = SlowScheduler(
+            SubscriptionStore(MemoryStorage()), FakeAdapter(), "", "UTC", 1000, 2
+        )
+        run_task = asyncio.create_task(scheduler.run())
+        while len(scheduler.ticks) < 3:
+            await asyncio.sleep(0)
+        running = list(scheduler.tasks)
+        run_task.cancel()
+        await asyncio.gather(run_task, *running, return_exceptions=True)
+        return scheduler, running
+
+    scheduler, running = asyncio.run(run())
+
+    minutes = [tick.minute for tick in scheduler.ticks[:3]]
+    assert minutes == [32, 33, 34]
+    assert len(running) >= 3 and all(task.cancelled() for task in running)
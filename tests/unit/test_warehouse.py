@@ -0,0 +1,160 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from botbuilder.core import MemoryStorage
+from botbuilder.schema import Activity, ActivityTypes, ChannelAccount
+from databricks.sdk.service.sql import State
+
+from chatx.const import OAUTH_CONNECTION_NAME, SPACES
+from chatx.warehouse import WarehouseWarmer
+from tests.unit import make_bot
+
+
+class FakeWarehouses:
+    def __init__(self, state: State, cold_start: float):
+        self.state = state
+        self.cold_start = cold_start
+        self.starts = 0
+        self.started_at = None
+
+    def get(self, warehouse_id: str):
+        if self.started_at and time.monotonic() - self.started_at >= self.cold_start:
+            self.state = State.RUNNING
+        return SimpleNamespace(id=warehouse_id, state=self.state)
+
+    def start(self, warehouse_id: str):
+        self.starts += 1
+        self.started_at = time.monotonic()
+        self.state = State.STARTING
+
+
+class FakeGenieQuerier:
+    def __init__(self, warehouses: FakeWarehouses):
+        self.workspace_client = SimpleNamespace(
+            genie=SimpleNamespace(
+                get_space=lambda space_id: SimpleNamespace(warehouse_id="wh-1")
+            ),
+            warehouses=warehouses,
+        )
+
+    async def get_workspace_client(self):
+        return self.workspace_client
+
+
+def test_warm_up_starts_stopped_warehouse_once(monkeypatch) -> None:
+    monkeypatch.setattr("chatx.warehouse.START_POLL_SECONDS", 0.01)
+
+    async def run():
+        warehouses = FakeWarehouses(State.STOPPED, cold_start=0.05)
+        warmer = WarehouseWarmer(cooldown_seconds=60)
+        querier = FakeGenieQuerier(warehouses)
+
+        await warmer.warm_up(querier, "space-1")
+        assert warmer.warm_up(querier, "space-1") is None  # within the cooldown
+        await asyncio.sleep(0.05)
+        warmer.record_question("space-1")
+        warmer.record_question("space-1")  # credited once per warm-up
+        return warmer, warehouses
+
+    warmer, warehouses = asyncio.run(run())
+
+    stats = warmer.stats["space-1"]
+    assert warehouses.starts == 1
+    assert warmer.warehouse_ids == {"space-1": "wh-1"}
+    assert stats.warm_ups == 1 and stats.questions_after_warm_up == 1
+    assert stats.cold_start_seconds >= 0.05
+    assert stats.seconds_avoided == pytest.approx(stats.cold_start_seconds)
+
+
+def test_warm_up_skips_running_warehouse() -> None:
+    async def run():
+        warehouses = FakeWarehouses(State.RUNNING, cold_start=0)
+        warmer = WarehouseWarmer(cooldown_seconds=0)
+        await warmer.warm_up(FakeGenieQuerier(warehouses), "space-1")
+        warmer.record_question("space-1")
+        return warmer, warehouses
+
+    warmer, warehouses = asyncio.run(run())
+
+    stats = warmer.stats["space-1"]
+    assert warehouses.starts == 0
+    assert stats.already_running == 1
+    assert stats.questions_after_warm_up == 0 and stats.seconds_avoided == 0
+
+
+class FailingWarehouses(FakeWarehouses):
+    def start(self, warehouse_id: str):
+        raise RuntimeError("PERMISSION_DENIED")
+
+
+@pytest.mark.parametrize(
+    ("warehouses", "credit"),
+    [
+        (FailingWarehouses(State.STOPPED, cold_start=0), True),
+        (FakeWarehouses(State.STOPPED, cold_start=0.05), False),
+    ],
+)
+def test_warm_up_is_not_credited(monkeypatch, warehouses, credit) -> None:
+    monkeypatch.setattr("chatx.warehouse.START_POLL_SECONDS", 0.01)
+
+    async def run():
+        warmer = WarehouseWarmer(cooldown_seconds=60)
+        task = warmer.warm_up(FakeGenieQuerier(warehouses), "space-1", credit)
+        await asyncio.sleep(0.02)
+        warmer.record_question("space-1")  # while the warehouse is starting
+        await task
+        warmer.record_question("space-1")
+        return warmer
+
+    stats = asyncio.run(run()).stats["space-1"]
+
+    assert stats.questions_after_warm_up == 0 and stats.seconds_avoided == 0
+
+
+def test_question_while_starting_is_credited_once_started(monkeypatch) -> None:
+    monkeypatch.setattr("chatx.warehouse.START_POLL_SECONDS", 0.01)
+
+    async def run():
+        warmer = WarehouseWarmer(cooldown_seconds=60)
+        warehouses = FakeWarehouses(State.STOPPED, cold_start=0.1)
+        task = warmer.warm_up(FakeGenieQuerier(warehouses), "space-1")
+        await asyncio.sleep(0.03)
+        warmer.record_question("space-1")
+        assert warmer.stats["space-1"].questions_after_warm_up == 0
+        await task
+        return warmer
+
+    stats = asyncio.run(run()).stats["space-1"]
+
+    assert stats.questions_after_warm_up == 1
+    assert 0.03 <= stats.seconds_avoided < stats.cold_start_seconds
+
+
+def test_members_added_warms_up_with_the_users_token(monkeypatch) -> None:
+    warmed = []
+    monkeypatch.setattr(
+        WarehouseWarmer,
+        "warm_up",
+        lambda self, genie_querier, space_id, credit=True: warmed.append(
+            (genie_querier._token, space_id)
+        ),
+    )
+    space_id = next(iter(SPACES.values()))
+
+    async def run():
+        storage = MemoryStorage()
+        await storage.write({"Channels.test/users/User1": {"SpaceId": space_id}})
+        _, adapter = make_bot(auth_method="oauth", storage=storage)
+        adapter.add_user_token(OAUTH_CONNECTION_NAME, "test", "User1", "user-token")
+        await adapter.receive_activity(
+            Activity(
+                type=ActivityTypes.conversation_update,
+                members_added=[ChannelAccount(id="User1")],
+            )
+        )
+
+    asyncio.run(run())
+
+    assert warmed == [("user-token", space_id)]